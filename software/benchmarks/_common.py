@@ -0,0 +1,74 @@
+"""Helpers shared by the benchmark scripts."""
+
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+
+def spawn_daemon(module, cls, config_text, directory, env=None):
+    """Start a yaq daemon class in its own process, with the given config file contents."""
+    config = directory / f"{cls}.toml"
+    config.write_text(config_text)
+    log = open(directory / f"{cls}.log", "w")
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            f"from {module} import {cls}; {cls}.main()",
+            "--config",
+            str(config),
+        ],
+        stdout=log,
+        stderr=subprocess.STDOUT,
+        env=env,
+        cwd=directory,
+    )
+
+
+def wait_for_port(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"nothing listening on port {port}")
+            time.sleep(0.1)
+
+
+def cpu_seconds(pid):
+    """User plus system CPU time of a process, from /proc."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def stop(processes):
+    for proc in processes:
+        proc.terminate()
+    for proc in processes:
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def print_table(rows, columns):
+    """Print a list of dicts as an aligned table."""
+    cells = [[_format(row.get(c)) for c in columns] for row in rows]
+    widths = [max([len(c)] + [len(r[i]) for r in cells]) for i, c in enumerate(columns)]
+    print("  ".join(c.rjust(w) for c, w in zip(columns, widths)))
+    for r in cells:
+        print("  ".join(v.rjust(w) for v, w in zip(r, widths)))
+
+
+def _format(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.3g}"
+    return str(value)
@@ -0,0 +1,148 @@
+"""Benchmark the gas uptake director against simulated daemons.
+
+Starts fake MCP9600 and MCP3428 daemons on the ports the director expects, then
+the director itself (GPIO through the gpiozero mock pin factory), all in a
+temporary home directory. For each poll period the director records for a while
+and the script reports achieved poll rate, poll latency and jitter, dropped polls,
+director CPU use and record file throughput, from the director's own metrics.
+
+    python bench_director.py --periods 1 0.5 0.2 0.1 --duration 30 --latency 0.01
+
+With --boards the director polls that many four channel boards instead of the
+default three, to see how it scales with reactor count.
+"""
+
+
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+
+import yaqc
+
+from _common import spawn_daemon, wait_for_port, cpu_seconds, stop, print_table
+
+
+def fault_config(args):
+    return (
+        f"latency = {args.latency}\n"
+        f"latency_jitter = {args.latency_jitter}\n"
+        f"failure_rate = {args.failure_rate}\n"
+        f"hang_rate = {args.hang_rate}\n"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--periods", type=float, nargs="+", default=[1.0, 0.5, 0.2, 0.1])
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per period")
+    parser.add_argument("--latency", type=float, default=0.0, help="daemon response latency, s")
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--conversion-time", type=float, default=0.0667, help="per channel, s")
+    parser.add_argument("--format", default="txt", choices=["txt", "h5"])
+    parser.add_argument("--oversampling", default="none")
+    parser.add_argument(
+        "--boards", type=int, default=3, help="pressure boards, four channels each"
+    )
+    parser.add_argument(
+        "--deadband", type=float, default=0.0, help="adaptive recording deadband, PSI"
+    )
+    args = parser.parse_args()
+
+    home = pathlib.Path(tempfile.mkdtemp(prefix="gas-uptake-bench-"))
+    data = home / "Desktop" / "gas-uptake-data"
+    data.mkdir(parents=True)
+    env = dict(os.environ, HOME=str(home), GPIOZERO_PIN_FACTORY="mock")
+    faults = fault_config(args)
+    processes = []
+    try:
+        processes.append(
+            spawn_daemon(
+                "simulation",
+                "FakeMCP9600",
+                "[temperature-sensor]\nport = 39001\nseed = 0\n" + faults,
+                home,
+                env,
+            )
+        )
+        ports = {f"board_{i}": 39100 + i for i in range(args.boards)}
+        boards = "".join(
+            f"[{name}]\nport = {port}\nseed = {port}\nconversion_time = {args.conversion_time}\n"
+            + faults
+            for name, port in ports.items()
+        )
+        processes.append(spawn_daemon("simulation", "FakeMCP3428", boards, home, env))
+        for port in [39001, *ports.values()]:
+            wait_for_port(port)
+        director_config = (
+            "[director]\nport = 39000\n"
+            f'record_format = "{args.format}"\n'
+            f'oversampling = "{args.oversampling}"\n'
+            f"record_deadband = {args.deadband}\n"
+            + "".join(
+                f'[[director.boards]]\nname = "{name}"\nport = {port}\n'
+                for name, port in ports.items()
+            )
+        )
+        director = spawn_daemon("director", "GasUptakeDirector", director_config, home, env)
+        processes.append(director)
+        wait_for_port(39000)
+        client = yaqc.Client(39000)
+        rows = []
+        for period in args.periods:
+            client.set_poll_period(period)
+            time.sleep(max(period, 1))  # settle
+            client.reset_metrics()
+            client.reset_tick_counters()
+            # only the record, the catalog is written to the same directory
+            before = set(data.glob("gas-uptake_*"))
+            client.begin_recording()
+            cpu = cpu_seconds(director.pid)
+            start = time.monotonic()
+            time.sleep(args.duration)
+            metrics = client.get_metrics()
+            missed = client.get_missed_ticks()
+            late = client.get_late_ticks()
+            compression = client.get_record_compression()["ratio"]
+            client.stop_recording()
+            elapsed = time.monotonic() - start
+            cpu = cpu_seconds(director.pid) - cpu
+            [path] = set(data.glob("gas-uptake_*")) - before
+            poll = metrics.get("poll", {})
+            jitter = metrics.get("poll_jitter", {})
+            flush = metrics.get("flush", {})
+            polls = poll.get("count", 0)
+            rows.append(
+                {
+                    "period (s)": period,
+                    "rate (Hz)": polls / elapsed,
+                    "poll p50 (ms)": 1000 * poll.get("p50", float("nan")),
+                    "poll p99 (ms)": 1000 * poll.get("p99", float("nan")),
+                    "jitter p99 (ms)": 1000 * jitter.get("p99", float("nan")),
+                    "missed": missed,
+                    "late": late,
+                    "cpu (%)": 100 * cpu / elapsed,
+                    "file (kB/s)": path.stat().st_size / elapsed / 1e3,
+                    "compression": compression,
+                    "flush p99 (ms)": 1000 * flush.get("p99", float("nan")),
+                }
+            )
+        print_table(rows, list(rows[0]))
+        print()
+        print("acquire round trip (ms), last period:")
+        acquire = [
+            {"board": k[len("acquire_") :], **{s: 1000 * v for s, v in m.items() if s != "count"}}
+            for k, m in sorted(metrics.items())
+            if k.startswith("acquire_")
+        ]
+        if acquire:
+            print_table(acquire, list(acquire[0]))
+    finally:
+        stop(processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark MainWindow.poll headless.
+
+Builds the main window on Qt's offscreen platform, in a temporary home directory,
+and feeds it synthetic rows (simulation.UptakeCurve) as fast as it will take them,
+recording to file. Each call includes processing the resulting paint events,
+unless --no-paint is given. For each history length the script reports per-row
+latency, the achievable row rate and CPU use. The poll worker is left idle;
+daemon latency is covered by bench_director.py.
+
+    python bench_gui.py --rows 2000 --history-lengths 1000 10000 100000
+"""
+
+
+import argparse
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+home = pathlib.Path(tempfile.mkdtemp(prefix="gas-uptake-bench-"))
+os.environ["HOME"] = str(home)
+os.environ.pop("XDG_DATA_HOME", None)
+os.environ.pop("XDG_DESKTOP_DIR", None)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+(home / "Desktop" / "gas-uptake-data").mkdir(parents=True)
+
+import numpy as np
+from qtpy import QtWidgets
+
+from gas_uptake._main_window import MainWindow
+from gas_uptake.metrics import Histogram
+from simulation import UptakeCurve
+
+from _common import print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000, help="rows per history length")
+    parser.add_argument("--history-lengths", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--format", default="txt", choices=["txt", "h5"])
+    parser.add_argument("--no-paint", action="store_true", help="never show the window")
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv)
+    curve = UptakeCurve(12, time_constant=args.rows / 10, delay=0, rng=np.random.default_rng(0))
+    unused = {"host": "127.0.0.1", "port": 1}
+    results = []
+    for history_length in args.history_lengths:
+        config = {
+            "history_length": history_length,
+            "poll_period": 3600,  # keep the worker idle
+            "record_format": args.format,
+            "temp_client": unused,
+            "current_sense_upper": unused,
+            "current_sense_lower": unused,
+        }
+        window = MainWindow(app, config)
+        window.create_central_widget()
+        window.resize(1600, 900)
+        if not args.no_paint:
+            window.show()
+        # fill history so the plot is drawing history_length points
+        t0 = time.time()
+        for i in range(history_length):
+            row = np.r_[t0 + i, 25.0, curve.pressure(i)]
+            window.data.append(row)
+        window._on_record(None)
+        histogram = Histogram()
+        cpu = time.process_time()
+        start = time.perf_counter()
+        for i in range(args.rows):
+            row = np.r_[t0 + history_length + i, 25.0, curve.pressure(history_length + i)]
+            tick = time.perf_counter()
+            window.poll(row)
+            if not args.no_paint:
+                app.processEvents()
+            histogram.record(time.perf_counter() - tick)
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu
+        window.close()  # also closes the record file
+        summary = histogram.summary()
+        results.append(
+            {
+                "history": history_length,
+                "p50 (ms)": 1000 * summary["p50"],
+                "p99 (ms)": 1000 * summary["p99"],
+                "max (ms)": 1000 * summary["max"],
+                "rate (Hz)": args.rows / elapsed,
+                "cpu (%)": 100 * cpu / elapsed,
+            }
+        )
+    print_table(results, list(results[0]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark gas_uptake cold start.
+
+Each case runs in a fresh interpreter, several times, and the median wall time
+is reported against its budget. With --top the packages that take longest to
+import are listed for each case, from -X importtime. Exits non-zero if a case is
+over budget, so it can gate CI.
+
+    python bench_import.py --repeat 5 --top 10
+"""
+
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+from _common import print_table
+
+
+# name: (python source, budget in seconds)
+cases = {
+    "interpreter": ("pass", None),
+    "cli --version": (
+        "import sys; sys.argv = ['gas-uptake', '--version']\n"
+        "from gas_uptake.__main__ import main\n"
+        "try:\n    main()\nexcept SystemExit:\n    pass",
+        0.3,
+    ),
+    "import io": ("import gas_uptake.io", 0.5),
+    "import recording": ("import gas_uptake.recording", 0.3),
+    "import main window": ("import gas_uptake._main_window", 2.5),
+}
+
+
+def run(source, importtime=False):
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    start = time.perf_counter()
+    proc = subprocess.run(command + ["-c", source], capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode:
+        raise RuntimeError(proc.stderr)
+    return elapsed, proc.stderr
+
+
+def slowest(importtime_log, n):
+    """Packages by total import time, summed over their modules, from -X importtime."""
+    totals = dict()
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, _, name = line[len("import time:") :].split("|")
+        if not own.strip().isdigit():
+            continue  # header line
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(own) / 1e6
+    return sorted(((t, p) for p, t in totals.items()), reverse=True)[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--top", type=int, default=0, help="list the slowest packages of each case"
+    )
+    args = parser.parse_args()
+
+    results = []
+    over = []
+    for name, (source, budget) in cases.items():
+        run(source)  # warm the filesystem and bytecode caches
+        times = [run(source)[0] for _ in range(args.repeat)]
+        median = statistics.median(times)
+        results.append(
+            {
+                "case": name,
+                "median (ms)": 1000 * median,
+                "min (ms)": 1000 * min(times),
+                "budget (ms)": None if budget is None else 1000 * budget,
+                "ok": "-" if budget is None else ("yes" if median <= budget else "NO"),
+            }
+        )
+        if budget is not None and median > budget:
+            over.append(name)
+    print_table(results, list(results[0]))
+    for name, (source, _) in cases.items():
+        if not args.top or name == "interpreter":
+            continue
+        print()
+        print(f"slowest imports, {name}:")
+        print_table(
+            [
+                {"package": p, "time (ms)": 1000 * t}
+                for t, p in slowest(run(source, True)[1], args.top)
+            ],
+            ["package", "time (ms)"],
+        )
+    if over:
+        sys.exit(f"over budget: {', '.join(over)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark record writing and pressure conversion across channel counts.
+
+For each channel count, rows of synthetic uptake data are written through each
+record format, one ``write`` call per row the way the director and GUI do, then
+flushed. The script reports rows and megabytes per second, the longest ``write``
+call (what an acquisition loop would see) and the time to convert a frame of
+raw currents to pressure.
+
+    python bench_recording.py --channels 12 24 48 96 --rows 20000
+"""
+
+
+import argparse
+import pathlib
+import tempfile
+import time
+
+import numpy as np
+
+from gas_uptake.calibration import Calibration
+from gas_uptake.recording import formats
+from simulation import UptakeCurve
+
+from _common import print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--channels", type=int, nargs="+", default=[12, 24, 48, 96])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--formats", nargs="+", default=list(formats))
+    args = parser.parse_args()
+
+    directory = pathlib.Path(tempfile.mkdtemp(prefix="gas-uptake-bench-"))
+    results = []
+    for n in args.channels:
+        curve = UptakeCurve(n, time_constant=args.rows / 10, delay=0, rng=np.random.default_rng(0))
+        currents = np.array([curve.current(i) for i in range(args.rows)])
+        calibration = Calibration([("board", f"channel_{i}") for i in range(n)])
+        start = time.perf_counter()
+        for frame in currents[:1000]:
+            calibration.convert(frame)
+        convert = (time.perf_counter() - start) / min(len(currents), 1000)
+        data = np.column_stack(
+            [
+                np.arange(args.rows, dtype=float),
+                np.full(args.rows, 25.0),
+                calibration.convert(currents),
+            ]
+        )
+        columns = ["labtime", "temperature"] + [f"pressure_{i}" for i in range(n)]
+        for name in args.formats:
+            cls = formats[name]
+            path = directory / f"{n}{cls.suffix}"
+            try:
+                writer = cls(path, {"channels": n}, columns)
+            except ImportError as e:
+                print(f"skipping {name}: {e}")
+                continue
+            longest = 0.0
+            start = time.perf_counter()
+            for row in data:
+                tick = time.perf_counter()
+                writer.write(row)
+                longest = max(longest, time.perf_counter() - tick)
+            writer.close()
+            elapsed = time.perf_counter() - start
+            results.append(
+                {
+                    "channels": n,
+                    "format": name,
+                    "rows/s": args.rows / elapsed,
+                    "MB/s": path.stat().st_size / elapsed / 1e6,
+                    "bytes/row": path.stat().st_size / args.rows,
+                    "max write (ms)": 1000 * longest,
+                    "convert (us)": 1e6 * convert,
+                }
+            )
+    print_table(results, list(results[0]))
+
+
+if __name__ == "__main__":
+    main()
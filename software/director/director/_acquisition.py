@@ -0,0 +1,75 @@
+__all__ = ["Acquisition"]
+
+import asyncio
+import concurrent.futures
+import functools
+import time
+from typing import Dict, Any, Optional, Iterable
+
+
+class Acquisition:
+    """Query several yaq daemons at the same time.
+
+    yaqc clients are blocking, so every ``get_measured`` call is handed to a bounded
+    thread pool (one worker per device) and awaited with a per-device timeout.
+    Total latency is therefore about one round trip, not one per device.
+
+    A device that raises or does not answer in time is reported as ``None``.
+    Its request is left to finish in the background and is shared by later callers
+    until it does, so a hung daemon never accumulates blocked threads.
+
+    Given a ``gas_uptake.metrics.Metrics``, the round trip of every request is
+    recorded as ``acquire_<name>``, including requests that outlived the timeout.
+    """
+
+    def __init__(self, clients, timeout=0.5, loop=None, metrics=None):
+        self._clients = dict(clients)
+        self.timeout = timeout
+        self._loop = loop if loop is not None else asyncio.get_event_loop()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(len(self._clients), 1), thread_name_prefix="acquisition"
+        )
+        self._in_flight: Dict[str, asyncio.Future] = dict()
+        self.failures = {name: 0 for name in self._clients}
+        self.metrics = metrics
+
+    async def get_measured(self, names: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Get measured from each named device (default all), concurrently.
+
+        Returns a dictionary of device name to measured dictionary, or ``None`` for
+        devices that failed or timed out.
+        """
+        if names is None:
+            names = list(self._clients)
+        else:
+            names = list(names)
+        results = await asyncio.gather(*[self._get_measured(name) for name in names])
+        return dict(zip(names, results))
+
+    async def _get_measured(self, name):
+        future = self._in_flight.get(name)
+        if future is None or future.done():
+            future = self._loop.run_in_executor(self._executor, self._clients[name].get_measured)
+            future.add_done_callback(_retrieve_exception)
+            if self.metrics is not None:
+                future.add_done_callback(
+                    functools.partial(self._record, name, time.perf_counter())
+                )
+            self._in_flight[name] = future
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except Exception:
+            self.failures[name] += 1
+            return None
+
+    def _record(self, name, start, future):
+        self.metrics.record(f"acquire_{name}", time.perf_counter() - start)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def _retrieve_exception(future):
+    # mark exceptions of abandoned requests as retrieved so asyncio stays quiet
+    if not future.cancelled():
+        future.exception()
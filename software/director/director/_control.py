@@ -0,0 +1,138 @@
+__all__ = ["TemperatureController"]
+
+import collections
+import datetime
+import logging
+import math
+import time
+
+import numpy as np
+from simple_pid import PID
+from gas_uptake.recording import TextRecordWriter
+
+
+class TemperatureController:
+    """PID temperature control, independent of data logging.
+
+    ``step`` is meant to be called at a fixed rate (see PollScheduler). It reads the
+    temperature sensor ``name`` of the acquisition, runs the PID and sets the heater
+    duty. Readings are kept in ``temps``.
+
+    ``begin_step_response`` switches to open loop: the heater is held at a fixed
+    duty for a while and the temperature trace is recorded to a file. When the
+    step ends, a first order plus dead time model is fitted to the trace and PI
+    gains are suggested using the SIMC rules (Skogestad 2003). PID control
+    resumes afterwards with unchanged gains.
+    """
+
+    def __init__(self, acquisition, heater, gains, name="temperature", temps=500, logger=None):
+        self._acquisition = acquisition
+        self.heater = heater
+        self.name = name
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+        kp, ki, kd = gains
+        self.pid = PID(
+            Kp=kp,
+            Ki=ki,
+            Kd=kd,
+            setpoint=0,
+            output_limits=(0, 1),
+            proportional_on_measurement=True,
+        )
+        self.temps = collections.deque(maxlen=temps)
+        self.temperature = float("nan")
+        self._test = None
+        self.step_result = dict()
+
+    @property
+    def setpoint(self):
+        return self.pid.setpoint
+
+    @setpoint.setter
+    def setpoint(self, value):
+        self.pid.setpoint = value
+        self.pid.reset()
+
+    async def step(self):
+        d = (await self._acquisition.get_measured([self.name]))[self.name]
+        self.temperature = float("nan") if d is None else d.get("temperature", float("nan"))
+        self.temps.append(self.temperature)
+        if self._test is not None:
+            self._step_response()
+        elif math.isnan(self.temperature):
+            self.heater.duty = 0  # no reading, fail safe
+        else:
+            self.heater.duty = self.pid(self.temperature)
+
+    def begin_step_response(self, duty, duration, path):
+        """Hold the heater at ``duty`` for ``duration`` seconds, recording to ``path``."""
+        self.abort_step_response()
+        header = dict()
+        header["timestamp"] = datetime.datetime.now().isoformat()
+        header["step duty"] = duty
+        header["temperature units"] = "C"
+        writer = TextRecordWriter(path, header, ["labtime", "temperature", "duty"])
+        self._test = {"duty": duty, "end": time.time() + duration, "writer": writer, "trace": []}
+        self.step_result = dict()
+        self.heater.duty = duty
+
+    def _step_response(self):
+        step = self._test
+        now = time.time()
+        row = [now, self.temperature, step["duty"]]
+        step["writer"].write(row)
+        step["trace"].append(row)
+        if now >= step["end"] or math.isnan(self.temperature):
+            self._finish_step_response()  # finished, or lost the sensor
+
+    def _finish_step_response(self):
+        step = self._test
+        step["writer"].close()
+        self._test = None
+        self.heater.duty = 0
+        self.pid.reset()
+        if step["trace"]:
+            trace = np.array(step["trace"])
+            self.step_result = fit_step_response(trace[:, 0], trace[:, 1], step["duty"])
+            self.logger.info(f"step response {self.step_result}")
+
+    def abort_step_response(self):
+        if self._test is not None:
+            self._finish_step_response()
+
+
+def fit_step_response(t, temperature, duty):
+    """First order plus dead time fit of a step response, with SIMC PI gains.
+
+    Uses the 28.3% and 63.2% rise times. Returns NaN values if the response did
+    not rise far enough to measure them.
+    """
+    t = np.asarray(t) - t[0]
+    y = np.asarray(temperature)
+    y0 = y[0]
+    yf = np.nanmean(y[-max(len(y) // 10, 1) :])
+    result = dict.fromkeys(["gain", "time_constant", "dead_time", "kp", "ki", "kd"], float("nan"))
+    rise = yf - y0
+    if not rise > 0 or duty <= 0:
+        return result
+    fraction = (y - y0) / rise
+    above28 = np.nonzero(fraction >= 0.283)[0]
+    above63 = np.nonzero(fraction >= 0.632)[0]
+    if not len(above28) or not len(above63):
+        return result
+    t28 = t[above28[0]]
+    t63 = t[above63[0]]
+    tau = 1.5 * (t63 - t28)
+    theta = max(t63 - tau, 0.0)
+    k = rise / duty
+    result["gain"] = k
+    result["time_constant"] = tau
+    result["dead_time"] = theta
+    # SIMC with closed loop time constant equal to the dead time
+    tau_c = max(theta, 0.1 * tau)
+    kc = tau / (k * (tau_c + theta))
+    ti = min(tau, 4 * (tau_c + theta))
+    result["kp"] = kc
+    result["ki"] = kc / ti if ti > 0 else float("nan")
+    result["kd"] = 0.0
+    return result
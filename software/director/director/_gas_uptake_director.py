@@ -1,31 +1,36 @@
 __all__ = ["GasUptakeDirector"]
 
 import os
+import math
 import time
-import yaqc
 import gpiozero
 import asyncio
 from typing import Dict, Any
 import datetime
-import collections
 import pathlib
-from simple_pid import PID
+import numpy as np
 from yaqd_core import IsDaemon
+from gas_uptake.recording import open_record_writer, DeadbandFilter, RunJournal
+from gas_uptake.catalog import add_to_catalog
+from gas_uptake.io import load
+from gas_uptake.clients import ManagedClient, start_measuring
+from gas_uptake.calibration import Calibration
+from gas_uptake.metrics import Metrics
+from gas_uptake.online import UptakeMonitor
 
 from .__version__ import *
+from ._acquisition import Acquisition
+from ._scheduler import PollScheduler
+from ._oversampling import Oversampler
+from ._stream import StreamServer
+from ._history import History
+from ._heater import PWMHeater
+from ._control import TemperatureController
 
 os.chdir(os.path.expanduser("~"))
 data_directory = pathlib.Path("Desktop/gas-uptake-data")
 
 
-def write_row(path, row):
-    with open(path, "a") as f:
-        for n in row:
-            f.write("%8.6f" % n)
-            f.write("\t")
-        f.write("\n")
-
-
 class GasUptakeDirector(IsDaemon):
     _kind = "gas-uptake-director"
 
@@ -33,121 +38,460 @@ class GasUptakeDirector(IsDaemon):
         self.i = 0
         super().__init__(name, config, config_filepath)
         self.recording = False
-        self.temps = collections.deque(maxlen=500)
-        self.set_temp = 0
+        self._writer = None
+        self._metrics = Metrics()
         self.row = []
-        #time.sleep(30)
-        # initialize clients
-        self._heater_client = gpiozero.DigitalOutputDevice(pin=18)  #yaqc.Client(38455)
-        self._heater_client.value = 0
-        self._temp_client = yaqc.Client(39001)
-        self._temp_client.measure(loop=True)
-        self._pressure_client_a = yaqc.Client(39100)
-        #self._pressure_client_a.set_state(gain=2, size=16)
-        self._pressure_client_a.measure(loop=True)
-        self._pressure_client_b = yaqc.Client(39101)
-        #self._pressure_client_b.set_state(gain=2, size=16)
-        self._pressure_client_b.measure(loop=True)
-        self._pressure_client_c = yaqc.Client(39102)
-        #self._pressure_client_c.set_state(gain=2, size=16)
-        self._pressure_client_c.measure(loop=True)
+        # zones: one thermocouple daemon and heater output each
+        # boards: pressure sensor daemons, channels in transducer order
+        self._zone_names = [zone["name"] for zone in self._config["zones"]]
+        board_names = [board["name"] for board in self._config["boards"]]
+        names = self._zone_names + board_names
+        if not self._zone_names or len(set(names)) != len(names):
+            raise ValueError(f"zone and board names must be unique and non-empty, got {names}")
+        # initialize clients, they connect on first use and reconnect by themselves
+        self._devices = dict()
+        for table in self._config["zones"] + self._config["boards"]:
+            self._devices[table["name"]] = ManagedClient(
+                table["host"],
+                table["port"],
+                name=table["name"],
+                on_connect=start_measuring,
+                backoff=self._config["reconnect_backoff"],
+                max_backoff=self._config["reconnect_max_backoff"],
+                logger=self.logger,
+            )
+        self._acquisition = Acquisition(
+            self._devices,
+            timeout=self._config["acquisition_timeout"],
+            loop=self._loop,
+            metrics=self._metrics,
+        )
+        if self._config["oversampling"] == "none":
+            self._oversampler = None
+        else:
+            self._oversampler = Oversampler(
+                self._acquisition,
+                board_names,
+                method=self._config["oversampling"],
+                window=self._config["oversampling_window"],
+                alpha=self._config["oversampling_alpha"],
+                interval=self._config["oversampling_interval"],
+            )
+            self._loop.create_task(self._oversampler.run())
+        channels = [
+            {"device": board["name"], "key": key}
+            for board in self._config["boards"]
+            for key in board["channels"]
+        ]
+        for channel, serial in zip(channels, self._config["transducer_serials"]):
+            channel["serial"] = serial
+        self._calibration = Calibration.from_config(
+            {"channels": channels, "curves": self._config["calibration_curves"]},
+            default_map=None,
+            logger=self.logger,
+        )
+        n = len(self._calibration)
+        offsets = self._state["channel_offsets"]
+        if len(offsets) != n:
+            # first start with this layout, carry over offsets from the per-channel state
+            offsets = [self._state.get(f"channel_{i}_offset", 0.0) for i in range(n)]
+            self._state["channel_offsets"] = offsets
+        self._calibration.offsets[:] = offsets
+        self._last_currents = np.full(n, np.nan)
+        self._noise = np.full(n, np.nan)
+        if len(self._zone_names) == 1:
+            temperatures = ["temperature"]
+        else:
+            temperatures = [f"temperature_{zone}" for zone in self._zone_names]
+        pressure_columns = [f"pressure_{i}" for i in range(n)]
+        self._columns = ["labtime"] + temperatures + pressure_columns
+        if self._config["record_noise"]:
+            self._columns += [f"pressure_{i}_std" for i in range(n)]
+        # uptake rate and endpoint of each reactor, updated every poll
+        self._uptake = UptakeMonitor(
+            n,
+            window=self._config["rate_window"],
+            alpha=self._config["rate_alpha"],
+            plateau_rate=self._config["plateau_rate"],
+            plateau_time=self._config["plateau_time"],
+        )
+        if self._config["record_rates"]:
+            self._columns += [f"pressure_{i}_rate" for i in range(n)]
+        # adaptive recording, rows are written when something changes
+        deadbands = np.full(len(self._columns), np.inf)
+        for columns, key in [
+            (temperatures, "record_temperature_deadband"),
+            (pressure_columns, "record_deadband"),
+        ]:
+            if self._config[key] > 0:
+                deadbands[[self._columns.index(c) for c in columns]] = self._config[key]
+        adaptive = np.isfinite(deadbands).any()
+        self._record_filter = DeadbandFilter(
+            deadbands, self._config["record_max_interval"] if adaptive else 0
+        )
+        # history of the current run
+        self._history = History(
+            len(self._columns),
+            memory_rows=self._config["history_memory_rows"],
+            directory=self._config["history_directory"] or None,
+        )
+        # live stream
+        self._stream = StreamServer(
+            self._columns, backlog=self._config["stream_backlog"], logger=self.logger
+        )
+        if self._config["stream_port"] is not None:
+            self._loop.create_task(
+                self._stream.start(self._config.get("host", ""), self._config["stream_port"])
+            )
+        # temperature control, one PID per zone, each at its own rate
+        self._controllers = dict()
+        self._control_schedulers = dict()
+        zone_gains = self._state["zone_pid_gains"]
+        default_gains = [self._state["pid_kp"], self._state["pid_ki"], self._state["pid_kd"]]
+        for zone in self._config["zones"]:
+            name = zone["name"]
+            output = gpiozero.DigitalOutputDevice(pin=zone["heater_pin"])
+            output.value = 0
+            heater = PWMHeater(output, period=self._config["heater_period"])
+            controller = TemperatureController(
+                self._acquisition,
+                heater,
+                zone_gains.get(name, default_gains),
+                name=name,
+                logger=self.logger,
+            )
+            scheduler = PollScheduler(
+                controller.step,
+                self._state["control_period"],
+                policy="skip",
+                logger=self.logger,
+                metrics=self._metrics,
+                name="control" if len(self._zone_names) == 1 else f"control_{name}",
+            )
+            self._controllers[name] = controller
+            self._control_schedulers[name] = scheduler
+            self._loop.create_task(heater.run())
+            self._loop.create_task(scheduler.run())
         # begin looping
-        self._pid = PID(Kp=0.2, Ki=0.001, Kd=0.01, setpoint=0, proportional_on_measurement=True)
-        self._loop.create_task(self._runner())
-        self._loop.create_task(self._poll_temperature())
+        self._scheduler = PollScheduler(
+            self._poll,
+            self._state["poll_period"],
+            policy=self._config["overrun_policy"],
+            max_queued=self._config["max_queued_polls"],
+            logger=self.logger,
+            metrics=self._metrics,
+            name="poll",
+        )
+        self._loop.create_task(self._scheduler.run())
+        if self._config["metrics_file"]:
+            self._loop.create_task(self._dump_metrics())
+        # pick up a run interrupted by a crash or restart
+        self._journal = RunJournal(self._state_filepath.with_name(f"{self.name}-run.json"))
+        if self._config["resume_recording"]:
+            self._resume_recording()
+        else:
+            self._journal.end()
+
+    def close(self):
+        # keep the journal, so the run resumes when the daemon comes back
+        self._close_writer()
+        for controller in self._controllers.values():
+            controller.abort_step_response()
+            controller.heater.output.value = 0
+        self._stream.close()
+        self._history.clear()
+
+    def _controller(self, zone):
+        """Controller of the named zone, the first zone for an empty name."""
+        if not zone:
+            zone = self._zone_names[0]
+        if zone not in self._controllers:
+            raise ValueError(f"no zone {zone!r}, zones are {self._zone_names}")
+        return self._controllers[zone]
 
     def _connection_lost(self, peername):
         super()._connection_lost(peername)
-        self.set_temp = 0
+        for controller in self._controllers.values():
+            controller.setpoint = 0
 
     def begin_recording(self):
+        if self.recording:
+            self.stop_recording()
+        self._history.clear()
+        self._uptake.clear()
+        self._record_filter.reset()
         # create file
         now = datetime.datetime.now()
-        fname = "gas-uptake_" + now.strftime("%Y-%m-%d_%H-%M-%S") + ".txt"
-        self.record_path = data_directory / fname
-        tab = "\t"
-        newline = "\n"
-        with open(self.record_path, "a") as f:
-            f.write("timestamp:" + tab + "'" + now.isoformat() + "'" + newline)
-            f.write("gas-uptake version:" + tab + "'" +  __version__ + "'" + newline)
-            f.write("temperature units:" + tab + "'C'" + newline)
-            f.write("pressure units:" + tab + "'PSI'" + newline)
-            f.write("column:" + tab + "[")
-            f.write("'labtime'")
-            f.write(tab + "'temperature'")
-            for i in range(12):
-                f.write(tab + f"'pressure_{i}'")
-            f.write("]" + newline)
+        fname = "gas-uptake_" + now.strftime("%Y-%m-%d_%H-%M-%S")
+        header = dict()
+        header["timestamp"] = now.isoformat()
+        header["gas-uptake version"] = __version__
+        header["temperature units"] = "C"
+        header["pressure units"] = "PSI"
+        setpoints = [controller.setpoint for controller in self._controllers.values()]
+        header["temperature setpoint"] = setpoints[0] if len(setpoints) == 1 else setpoints
+        header["channel offsets"] = [float(x) for x in self._calibration.offsets]
+        self._writer = open_record_writer(
+            data_directory / fname,
+            header,
+            self._columns,
+            format=self._config["record_format"],
+            **self._writer_options(),
+        )
+        self.record_path = self._writer.path
+        self._journal.begin(
+            self.record_path,
+            header,
+            self._columns,
+            format=self._config["record_format"],
+            setpoints=self._setpoints(),
+            offsets=header["channel offsets"],
+        )
         # finish
         self.recording = True
         return self.record_path.as_posix()
 
+    def _writer_options(self):
+        return dict(
+            flush_rows=self._config["record_flush_rows"],
+            flush_interval=self._config["record_flush_interval"],
+            metrics=self._metrics,
+        )
+
+    def _setpoints(self):
+        return {name: controller.setpoint for name, controller in self._controllers.items()}
+
+    def _resume_recording(self):
+        try:
+            self._writer = self._journal.resume(
+                self._columns, max_gap=self._config["resume_max_gap"], **self._writer_options()
+            )
+        except Exception:
+            self.logger.exception(f"could not resume the run in {self._journal.path}")
+            self._journal.end()
+            return
+        if self._writer is None:
+            return
+        entry = self._journal.entry
+        stopped, resumed = entry["resumes"][-1]
+        gap = "unknown" if stopped is None else f"{resumed - stopped:.1f} s"
+        self.logger.info(f"resuming run in {self._writer.path}, gap {gap}")
+        # restore what the run was started or last noted with
+        state = entry["state"]
+        for name, setpoint in state.get("setpoints", {}).items():
+            if name in self._controllers:
+                self._controllers[name].setpoint = setpoint
+        offsets = state.get("offsets", [])
+        if len(offsets) == len(self._calibration):
+            self._calibration.offsets[:] = offsets
+            self._state["channel_offsets"] = offsets
+        if len(entry["segments"]) == 1:
+            # same file, so clients can query the history of the whole run
+            try:
+                for row in load(self._writer.path).data:
+                    self._history.append(row)
+            except Exception:
+                self.logger.exception(f"could not reload the history of {self._writer.path}")
+        self.record_path = self._writer.path
+        self.recording = True
+
     def stop_recording(self):
+        self._journal.end()
+        self._close_writer()
+
+    def _close_writer(self):
         self.recording = False
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            f = self._record_filter
+            self.logger.info(
+                f"recorded {f.written} of {f.seen} rows, compression ratio {f.ratio:.3g}"
+            )
+            if self._loop.is_running():
+                self._loop.run_in_executor(None, self._index_record, self.record_path)
+
+    def _index_record(self, path):
+        try:
+            add_to_catalog(path)
+        except Exception:
+            self.logger.exception(f"could not add {path} to the catalog")
 
     def set_temperature(self, temp):
-        self.set_temp = temp
-        self._pid.reset()
+        for controller in self._controllers.values():
+            controller.setpoint = temp
+        self._journal.note(setpoints=self._setpoints())
+
+    def set_zone_temperature(self, zone, temp):
+        self._controller(zone).setpoint = temp
+        self._journal.note(setpoints=self._setpoints())
+
+    def get_zones(self):
+        return self._zone_names
 
     async def _poll(self):
         row = [time.time()]
+        # request all boards at once, failed boards come back as None
+        if self._oversampler is None:
+            measured = await self._acquisition.get_measured()
+        else:
+            measured = await self._acquisition.get_measured(self._zone_names)
+            boards, spread = self._oversampler.reduce()
+            measured.update(boards)
         # temperature
-        m = self._temp_client.get_measured()
-        value = m["temperature"]
-        row.append(value)
+        for zone in self._zone_names:
+            m = measured[zone]
+            row.append(float("nan") if m is None else m.get("temperature", float("nan")))
         # pressure
-        measured = []
-        i = 0
-        self._last_current_readings = dict()
-        for client in [
-            self._pressure_client_a,
-            self._pressure_client_b,
-            self._pressure_client_c,
-        ]:
-            m = client.get_measured()
-            for channel in range(4):
-                value = m[f"channel_{channel}"]
-                self._last_current_readings[i] = value
-                offset = self._state[f"channel_{i}_offset"]
-                value -= offset
-                value -= 4
-                value *= 150 / 20  # mA to PSI
-                if value < 0:
-                    value = float('nan')
-                measured.append(value)
-                row.append(value)
-                i += 1
+        with self._metrics.time("convert"):
+            self._last_currents = self._calibration.gather(measured)
+            pressures = self._calibration.convert(self._last_currents)
+            row.extend(pressures)
+            if self._oversampler is not None:
+                # standard deviation in PSI, through the local slope of the calibration
+                std = self._calibration.gather(spread)
+                self._noise = np.abs(
+                    self._calibration.convert(self._last_currents + std) - pressures
+                )
+            if self._config["record_noise"]:
+                row.extend(self._noise)
+        with self._metrics.time("uptake"):
+            self._uptake.append(row[0], pressures)
+            if self._config["record_rates"]:
+                row.extend(self._uptake.smoothed_rate)
         # append to data
-        self.row = row
-        # write to file
-        if self.recording:
-            write_row(self.record_path, row)
-        # PID
-        self._pid.setpoint = self.set_temp
-        duty = self._pid(row[1])
-        if duty >= 1:
-            self._heater_client.value = 1
-        elif duty <= 0:
-            self._heater_client.value = 0
-        else:
-            duty = round(duty, 2)
-            self._heater_client.blink(on_time=duty, off_time=10, n=1)
+        with self._metrics.time("write"):
+            self.row = row
+            self._stream.publish(row)
+            self._history.append(row)
+            # write to file
+            if self.recording:
+                self._writer.write_rows(self._record_filter.filter(row))
 
-    async def _poll_temperature(self):
+    async def _dump_metrics(self):
         while True:
-            d = self._temp_client.get_measured()
-            t = d["temperature"]
-            self.temps.append(t)
-            await asyncio.sleep(1)
-
-    async def _runner(self):
-        while True:
-            self._loop.create_task(self._poll())
-            await asyncio.sleep(self._state["poll_period"])
+            await asyncio.sleep(self._config["metrics_interval"])
+            try:
+                self._metrics.dump(self._config["metrics_file"])
+            except OSError:
+                self.logger.exception("could not write metrics file")
 
     def get_last_reading(self):
         return self.row
 
+    def get_device_health(self):
+        health = dict()
+        for name, client in self._devices.items():
+            h = client.health()
+            if h["seconds_since_success"] is None:
+                h["seconds_since_success"] = float("nan")
+            health[name] = h
+        return health
+
+    def get_record_compression(self):
+        f = self._record_filter
+        return {"seen": float(f.seen), "written": float(f.written), "ratio": f.ratio}
+
+    def get_uptake_rates(self):
+        return {
+            "rate": [float(x) for x in self._uptake.rate],
+            "smoothed_rate": [float(x) for x in self._uptake.smoothed_rate],
+            "plateau_time": [float(x) for x in self._uptake.plateau_time],
+        }
+
+    def get_finished(self):
+        return [bool(x) for x in self._uptake.finished]
+
+    def get_heater_stats(self, zone=""):
+        return self._controller(zone).heater.get_stats()
+
+    def get_pid_gains(self, zone=""):
+        kp, ki, kd = self._controller(zone).pid.tunings
+        return {"kp": kp, "ki": ki, "kd": kd}
+
+    def set_pid_gains(self, kp, ki, kd, zone=""):
+        if zone:
+            self._controller(zone).pid.tunings = (kp, ki, kd)
+            gains = dict(self._state["zone_pid_gains"])
+            gains[zone] = [kp, ki, kd]
+            self._state["zone_pid_gains"] = gains
+            return
+        for controller in self._controllers.values():
+            controller.pid.tunings = (kp, ki, kd)
+        self._state["zone_pid_gains"] = dict()
+        self._state["pid_kp"] = kp
+        self._state["pid_ki"] = ki
+        self._state["pid_kd"] = kd
+
+    def begin_step_response(self, duty, duration, zone=""):
+        """Open loop step test, for tuning. Returns the path of the trace file.
+
+        Parameters
+        ----------
+        duty : double
+            Heater duty held during the test, 0 to 1.
+        duration : double
+            Length of the test, seconds.
+        zone : string
+            Heater zone, the first zone if empty.
+        """
+        if not 0 < duty <= 1:
+            raise ValueError(f"duty must be in (0, 1], not {duty}")
+        controller = self._controller(zone)
+        now = datetime.datetime.now()
+        fname = f"step-response_{controller.name}_" + now.strftime("%Y-%m-%d_%H-%M-%S") + ".txt"
+        path = data_directory / fname
+        controller.begin_step_response(duty, duration, path)
+        return path.as_posix()
+
+    def abort_step_response(self, zone=""):
+        controllers = [self._controller(zone)] if zone else self._controllers.values()
+        for controller in controllers:
+            controller.abort_step_response()
+
+    def get_step_response(self, zone=""):
+        return self._controller(zone).step_result
+
+    def apply_step_response(self, zone=""):
+        controller = self._controller(zone)
+        result = controller.step_result
+        if not result or math.isnan(result["kp"]):
+            raise ValueError("no usable step response fit")
+        self.set_pid_gains(result["kp"], result["ki"], result["kd"], controller.name)
+
+    def set_control_period(self, period):
+        period = max(period, 0.1)
+        self._state["control_period"] = period
+        for scheduler in self._control_schedulers.values():
+            scheduler.period = period
+
+    def get_columns(self):
+        return self._columns
+
+    def get_history(self, t_start, t_end, max_points, method="mean"):
+        """Rows of the current run between two times, decimated on the daemon.
+
+        Parameters
+        ----------
+        t_start : double
+            Start, labtime (seconds since epoch).
+        t_end : double
+            End, labtime. Zero or negative for now.
+        max_points : int
+            Maximum number of rows returned.
+        method : string
+            'mean' or 'minmax'.
+        """
+        if t_end <= 0:
+            t_end = float("inf")
+        return self._history.query(t_start, t_end, max_points, method)
+
+    def get_stream_subscribers(self):
+        return self._stream.get_subscribers()
+
+    def get_noise(self):
+        return list(self._noise)
+
     def tare_pressure(self, known_value, channel_index):
         """Apply offset channel based on known pressure value.
 
@@ -156,15 +500,35 @@ class GasUptakeDirector(IsDaemon):
         known_value : double
             Known pressure, PSI.
         channel_index : int
-            Channel index, 0 through 11.
+            Channel index, in the order of the boards and their channels.
         """
         # convert from PSI to expected mA
-        value = known_value * 20 / 150
-        value += 4
+        psi = np.full(len(self._calibration), known_value)
+        value = self._calibration.invert(psi)[channel_index]
         # find offset
-        offset = self._last_current_readings[channel_index] - value
-        self._state[f"channel_{channel_index}_offset"] = offset
+        if math.isnan(self._last_currents[channel_index]):
+            raise ValueError(f"no current reading for channel {channel_index}")
+        offset = self._last_currents[channel_index] - value
+        self._calibration.offsets[channel_index] = offset
+        self._state["channel_offsets"] = [float(x) for x in self._calibration.offsets]
+        self._journal.note(offsets=self._state["channel_offsets"])
 
     def set_poll_period(self, period):
-        period = max(period, 1)
+        period = max(period, 0.1)
         self._state["poll_period"] = period
+        self._scheduler.period = period
+
+    def get_missed_ticks(self):
+        return self._scheduler.missed_ticks
+
+    def get_late_ticks(self):
+        return self._scheduler.late_ticks
+
+    def reset_tick_counters(self):
+        self._scheduler.reset_counters()
+
+    def get_metrics(self):
+        return self._metrics.summary()
+
+    def reset_metrics(self):
+        self._metrics.reset()
@@ -0,0 +1,104 @@
+__all__ = ["PWMHeater"]
+
+import asyncio
+import time
+
+
+class PWMHeater:
+    """Time-proportioned PWM on a digital output, from one long-lived task.
+
+    Each ``period`` seconds the output is switched on for ``duty * period`` seconds
+    and off for the rest. ``duty`` may be changed at any time: the current cycle is
+    lengthened or cut short to match, without restarting it. Pulses shorter than
+    ``min_pulse`` seconds are skipped (or the output held on) to spare the relay.
+
+    Parameters
+    ----------
+    output : gpiozero.DigitalOutputDevice
+        Anything with a writable ``value``.
+    period : float
+        PWM period, seconds.
+    min_pulse : float
+        Shortest on or off pulse, seconds.
+    """
+
+    def __init__(self, output, period=10.0, min_pulse=0.05):
+        self.output = output
+        self.period = period
+        self.min_pulse = min_pulse
+        self._duty = 0.0
+        self._changed = asyncio.Event()
+        self._on_since = None
+        self.on_time = 0.0  # total, seconds
+        self.cycles = 0
+        self.last_duty = float("nan")  # measured over the last complete cycle
+        self._started = time.monotonic()
+        self._set(0)
+
+    @property
+    def duty(self):
+        return self._duty
+
+    @duty.setter
+    def duty(self, value):
+        value = min(max(value, 0.0), 1.0)
+        if value != self._duty:
+            self._duty = value
+            self._changed.set()
+
+    def _set(self, value):
+        now = time.monotonic()
+        if value and self._on_since is None:
+            self._on_since = now
+        elif not value and self._on_since is not None:
+            self.on_time += now - self._on_since
+            self._on_since = None
+        self.output.value = value
+
+    def _total_on_time(self):
+        if self._on_since is None:
+            return self.on_time
+        return self.on_time + time.monotonic() - self._on_since
+
+    async def run(self):
+        try:
+            while True:
+                start = time.monotonic()
+                on_before = self._total_on_time()
+                while True:
+                    now = time.monotonic()
+                    end = start + self.period
+                    if now >= end:
+                        break
+                    on = self._duty * self.period
+                    if on < self.min_pulse:
+                        on = 0
+                    elif self.period - on < self.min_pulse:
+                        on = self.period
+                    if now < start + on:
+                        self._set(1)
+                        wake = start + on
+                    else:
+                        self._set(0)
+                        wake = end
+                    self._changed.clear()
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), wake - now)
+                    except asyncio.TimeoutError:
+                        pass
+                self.cycles += 1
+                self.last_duty = (self._total_on_time() - on_before) / (time.monotonic() - start)
+        finally:
+            self._set(0)
+
+    def get_stats(self):
+        """Commanded and measured duty, total on time and cycle count."""
+        elapsed = time.monotonic() - self._started
+        on_time = self._total_on_time()
+        return {
+            "duty": self._duty,
+            "last_duty": self.last_duty,
+            "mean_duty": on_time / elapsed if elapsed > 0 else float("nan"),
+            "on_time": on_time,
+            "cycles": float(self.cycles),
+        }
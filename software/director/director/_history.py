@@ -0,0 +1,157 @@
+__all__ = ["History"]
+
+import pathlib
+import shutil
+import tempfile
+import warnings
+
+import numpy as np
+
+
+class History:
+    """Time-indexed rows of the current run, in memory with spill to disk.
+
+    Rows are appended to fixed-size chunks. Once more than ``memory_rows`` rows
+    are held in memory, the oldest complete chunks are saved as ``.npy`` files in
+    ``directory`` and memory-mapped back on demand. The first column must be time,
+    non-decreasing.
+
+    Parameters
+    ----------
+    width : int
+        Number of columns.
+    chunk_rows : int
+        Rows per chunk.
+    memory_rows : int
+        Rows kept in memory before chunks are spilled.
+    directory : path-like, optional
+        Where to spill. A temporary directory by default.
+    """
+
+    def __init__(self, width, chunk_rows=3600, memory_rows=86400, directory=None):
+        self.width = width
+        self.chunk_rows = chunk_rows
+        self.memory_rows = memory_rows
+        self._parent = directory
+        self._directory = None
+        self._chunks = []  # list of (t_first, t_last, array or path)
+        self._current = np.empty((chunk_rows, width))
+        self._n = 0  # rows in current chunk
+        self._in_memory = 0  # rows in sealed chunks held in memory
+
+    def __len__(self):
+        return sum(len(self._load(c)) for _, _, c in self._chunks) + self._n
+
+    def append(self, row):
+        self._current[self._n] = row
+        self._n += 1
+        if self._n == self.chunk_rows:
+            self._seal()
+
+    def clear(self):
+        self._chunks = []
+        self._n = 0
+        self._in_memory = 0
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+    def _seal(self):
+        chunk = self._current
+        self._chunks.append((chunk[0, 0], chunk[-1, 0], chunk))
+        self._current = np.empty((self.chunk_rows, self.width))
+        self._n = 0
+        self._in_memory += len(chunk)
+        # spill oldest in-memory chunks
+        for i, (t_first, t_last, c) in enumerate(self._chunks):
+            if self._in_memory <= self.memory_rows:
+                break
+            if isinstance(c, np.ndarray):
+                if self._directory is None:
+                    self._directory = pathlib.Path(
+                        tempfile.mkdtemp(prefix="history-", dir=self._parent)
+                    )
+                path = self._directory / f"{i:06d}.npy"
+                np.save(path, c)
+                self._chunks[i] = (t_first, t_last, path)
+                self._in_memory -= len(c)
+
+    def _load(self, chunk):
+        if isinstance(chunk, np.ndarray):
+            return chunk
+        return np.load(chunk, mmap_mode="r")
+
+    def _blocks(self, t_start, t_end):
+        """Rows with t_start <= time <= t_end, one block per chunk, in order."""
+        chunks = list(self._chunks)
+        if self._n:
+            chunks.append(
+                (self._current[0, 0], self._current[self._n - 1, 0], self._current[: self._n])
+            )
+        for t_first, t_last, c in chunks:
+            if t_last < t_start or t_first > t_end:
+                continue
+            data = self._load(c)
+            i = np.searchsorted(data[:, 0], t_start, side="left")
+            j = np.searchsorted(data[:, 0], t_end, side="right")
+            if j > i:
+                yield data[i:j]
+
+    def query(self, t_start, t_end, max_points, method="mean"):
+        """Rows between ``t_start`` and ``t_end``, decimated to at most ``max_points``.
+
+        Parameters
+        ----------
+        t_start, t_end : float
+            Time range, inclusive, in the units of the first column.
+        max_points : int
+            Maximum number of rows returned, at least 1 for mean and 2 for minmax.
+        method : {'mean', 'minmax'}
+            mean returns the mean of each bin of rows. minmax returns two rows per
+            bin, the minimum then the maximum of every column, with the first and
+            last time of the bin.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of shape (rows, width).
+        """
+        if method not in ("mean", "minmax"):
+            raise ValueError(f"method must be 'mean' or 'minmax', not {method!r}")
+        bins = max_points if method == "mean" else max_points // 2
+        if bins < 1:
+            raise ValueError(f"max_points is too small for {method}: {max_points}")
+        n = sum(len(b) for b in self._blocks(t_start, t_end))
+        if n <= max_points:
+            return self._concatenate(list(self._blocks(t_start, t_end)))
+        bin_size = -(-n // bins)
+        out = []
+        carry = np.empty((0, self.width))
+        # reduce chunk by chunk, carrying incomplete bins, so only one chunk is copied at a time
+        for block in self._blocks(t_start, t_end):
+            block = np.concatenate([carry, block])
+            k = len(block) // bin_size
+            if k:
+                out.append(
+                    self._reduce(block[: k * bin_size].reshape(k, bin_size, self.width), method)
+                )
+            carry = block[k * bin_size :]
+        if len(carry):
+            out.append(self._reduce(carry[None], method))
+        return self._concatenate(out)
+
+    def _reduce(self, bins, method):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN bins stay NaN
+            if method == "mean":
+                return np.nanmean(bins, axis=1)
+            lo = np.nanmin(bins, axis=1)
+            hi = np.nanmax(bins, axis=1)
+        lo[:, 0] = bins[:, 0, 0]
+        hi[:, 0] = bins[:, -1, 0]
+        return np.stack([lo, hi], axis=1).reshape(-1, self.width)
+
+    def _concatenate(self, blocks):
+        if not blocks:
+            return np.empty((0, self.width))
+        return np.concatenate(blocks)
@@ -0,0 +1,117 @@
+__all__ = ["Oversampler"]
+
+import asyncio
+import collections
+from typing import Dict, Any
+
+import numpy as np
+
+
+class Oversampler:
+    """Sample sensor daemons continuously and reduce to one reading per poll.
+
+    One background task per device requests ``get_measured`` every ``interval``
+    seconds and keeps each new measurement (by ``measurement_id``), so readings
+    accumulate at the native rate of the board. ``reduce`` turns them into a
+    single measured dictionary per device, with the spread of the samples.
+
+    Methods
+    -------
+    mean, median
+        of the samples that arrived since the previous ``reduce``
+    boxcar
+        mean of the latest ``window`` samples, across poll boundaries
+    ema
+        exponential moving average with smoothing factor ``alpha``
+
+    If no new sample arrived since the previous poll the latest one is reused.
+    Devices whose latest request failed reduce to None. Readings without channel
+    keys, like the first reading of a daemon that has just started, are skipped.
+    """
+
+    methods = ("mean", "median", "boxcar", "ema")
+
+    def __init__(self, acquisition, names, method="mean", window=16, alpha=0.2, interval=0.02):
+        if method not in self.methods:
+            raise ValueError(f"method must be one of {self.methods}, not {method!r}")
+        self._acquisition = acquisition
+        self.names = list(names)
+        self.method = method
+        self.alpha = alpha
+        self.interval = interval
+        self._keys: Dict[str, list] = dict()
+        self._ok = {name: False for name in self.names}
+        self._pending = {name: [] for name in self.names}
+        self._window = {name: collections.deque(maxlen=window) for name in self.names}
+        self._ema: Dict[str, Any] = dict()
+        self._emv: Dict[str, Any] = dict()
+
+    async def run(self):
+        await asyncio.gather(*[self._sample(name) for name in self.names])
+
+    async def _sample(self, name):
+        last_id = None
+        while True:
+            m = (await self._acquisition.get_measured([name]))[name]
+            self._ok[name] = m is not None
+            if m is not None and (m.get("measurement_id") != last_id or last_id is None):
+                last_id = m.get("measurement_id")
+                self._append(name, m)
+            await asyncio.sleep(self.interval)
+
+    def _append(self, name, measured):
+        keys = sorted(k for k in measured if k != "measurement_id")
+        if not keys:
+            return  # initial reading of a daemon that has not measured yet
+        if keys != self._keys.get(name):
+            # first reading, or the daemon restarted with other channels
+            self._keys[name] = keys
+            self._pending[name].clear()
+            self._window[name].clear()
+            self._ema.pop(name, None)
+        sample = np.array([measured[k] for k in self._keys[name]], dtype=float)
+        self._pending[name].append(sample)
+        self._window[name].append(sample)
+        if name in self._ema:
+            # exponentially weighted mean and variance, West 1979
+            delta = sample - self._ema[name]
+            self._ema[name] = self._ema[name] + self.alpha * delta
+            self._emv[name] = (1 - self.alpha) * (self._emv[name] + self.alpha * delta**2)
+        else:
+            self._ema[name] = sample
+            self._emv[name] = np.zeros_like(sample)
+
+    def reduce(self):
+        """Reduce samples collected so far.
+
+        Returns
+        -------
+        measured, spread : dict
+            Device name to measured dictionary (value and standard deviation of
+            each key, in device units), or None for failed devices.
+        """
+        measured = dict()
+        spread = dict()
+        for name in self.names:
+            pending, self._pending[name] = self._pending[name], []
+            if not self._ok[name] or not self._window[name]:
+                measured[name] = spread[name] = None
+                continue
+            if self.method in ("mean", "median"):
+                samples = np.array(pending or [self._window[name][-1]])
+                if self.method == "mean":
+                    value = samples.mean(axis=0)
+                else:
+                    value = np.median(samples, axis=0)
+                std = samples.std(axis=0) if len(samples) > 1 else np.full(len(value), np.nan)
+            elif self.method == "boxcar":
+                samples = np.array(self._window[name])
+                value = samples.mean(axis=0)
+                std = samples.std(axis=0) if len(samples) > 1 else np.full(len(value), np.nan)
+            else:
+                value = self._ema[name]
+                std = np.sqrt(self._emv[name])
+            keys = self._keys[name]
+            measured[name] = dict(zip(keys, value))
+            spread[name] = dict(zip(keys, std))
+        return measured, spread
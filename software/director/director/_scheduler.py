@@ -0,0 +1,127 @@
+__all__ = ["PollScheduler"]
+
+import asyncio
+import logging
+import time
+
+
+class PollScheduler:
+    """Call a coroutine function at a fixed rate, never overlapping itself.
+
+    Ticks are laid out on a monotonic grid (``origin + n * period``), so sleeping
+    late on one tick does not push back the ones after it. If the event loop stalls
+    for more than a whole period the skipped grid points are counted as missed
+    and the clock jumps forward instead of firing a burst of catch-up ticks.
+
+    Calls run one at a time in tick order. When a tick arrives while the previous
+    call is still running, ``policy`` decides what happens:
+
+    skip
+        drop the tick
+    coalesce
+        remember at most one pending call, run it as soon as the current one ends
+    queue
+        remember up to ``max_queued`` pending calls
+
+    Ticks that are dropped count as missed. Ticks that fire more than
+    ``late_tolerance`` periods after their grid point count as late.
+
+    Given a ``gas_uptake.metrics.Metrics``, every tick records its lateness as
+    ``<name>_jitter``, every call its duration as ``<name>``, and every dropped
+    tick increments ``<name>_missed``.
+    """
+
+    policies = ("skip", "coalesce", "queue")
+
+    def __init__(
+        self,
+        callback,
+        period,
+        policy="skip",
+        max_queued=1,
+        late_tolerance=0.1,
+        logger=None,
+        metrics=None,
+        name="poll",
+    ):
+        if policy not in self.policies:
+            raise ValueError(f"policy must be one of {self.policies}, not {policy!r}")
+        self._callback = callback
+        self._period = period
+        self.policy = policy
+        self.max_queued = max_queued if policy == "queue" else 1
+        self.late_tolerance = late_tolerance
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+        self.metrics = metrics
+        self.name = name
+        self._rephase = True
+        self._pending = 0
+        self._worker = None
+        self.reset_counters()
+
+    @property
+    def period(self):
+        return self._period
+
+    @period.setter
+    def period(self, value):
+        self._period = value
+        self._rephase = True
+
+    def reset_counters(self):
+        self.ticks = 0
+        self.missed_ticks = 0
+        self.late_ticks = 0
+
+    async def run(self):
+        while True:
+            now = time.monotonic()
+            if self._rephase:
+                origin = now
+                n = 0
+                self._rephase = False
+            deadline = origin + n * self._period
+            if now < deadline:
+                await asyncio.sleep(deadline - now)
+                if self._rephase:
+                    continue
+                now = time.monotonic()
+            lateness = now - deadline
+            if lateness >= self._period:
+                skipped = int(lateness // self._period)
+                self._missed(skipped)
+                n += skipped
+                lateness -= skipped * self._period
+            if lateness > self.late_tolerance * self._period:
+                self.late_ticks += 1
+            self.ticks += 1
+            if self.metrics is not None:
+                self.metrics.record(f"{self.name}_jitter", lateness)
+            self._dispatch()
+            n += 1
+
+    def _dispatch(self):
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._work())
+        elif self.policy != "skip" and self._pending < self.max_queued:
+            self._pending += 1
+        else:
+            self._missed(1)
+
+    def _missed(self, n):
+        self.missed_ticks += n
+        if self.metrics is not None:
+            self.metrics.increment(f"{self.name}_missed", n)
+
+    async def _work(self):
+        while True:
+            start = time.perf_counter()
+            try:
+                await self._callback()
+            except Exception:
+                self.logger.exception(f"{self.name} failed")
+            if self.metrics is not None:
+                self.metrics.record(self.name, time.perf_counter() - start)
+            if not self._pending:
+                return
+            self._pending -= 1
@@ -0,0 +1,84 @@
+__all__ = ["StreamServer"]
+
+import asyncio
+import collections
+import json
+import logging
+import struct
+
+import numpy as np
+
+
+magic = b"GUS1"
+
+
+class StreamServer:
+    """Push every new row to any number of TCP subscribers.
+
+    On connection a subscriber receives ``magic``, the header length (uint32,
+    little endian) and a JSON header with the column names. After that each row
+    is sent as a fixed-size frame of ``len(columns)`` little endian float64.
+
+    Rows are packed once and queued per subscriber. Each queue holds at most
+    ``backlog`` frames; when a subscriber falls behind the oldest frames are
+    dropped, so a slow reader never holds up acquisition or other subscribers.
+    ``gas_uptake.stream`` implements the receiving end.
+    """
+
+    def __init__(self, columns, backlog=256, logger=None):
+        self.columns = list(columns)
+        self.backlog = backlog
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+        self._subscribers = set()
+        header = json.dumps({"columns": self.columns}).encode()
+        self._greeting = magic + struct.pack("<I", len(header)) + header
+        self._server = None
+
+    async def start(self, host, port):
+        self._server = await asyncio.start_server(self._serve, host, port)
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+
+    def publish(self, row):
+        if not self._subscribers:
+            return
+        frame = np.asarray(row, dtype="<f8").tobytes()
+        for subscriber in self._subscribers:
+            if len(subscriber.queue) == subscriber.queue.maxlen:
+                subscriber.dropped += 1  # deque discards the oldest frame
+            subscriber.queue.append(frame)
+            subscriber.ready.set()
+
+    def get_subscribers(self):
+        """Peer name to number of dropped frames, for each subscriber."""
+        return {s.peername: s.dropped for s in self._subscribers}
+
+    async def _serve(self, reader, writer):
+        subscriber = _Subscriber(writer.get_extra_info("peername"), self.backlog)
+        self.logger.info(f"stream subscriber connected from {subscriber.peername}")
+        self._subscribers.add(subscriber)
+        try:
+            writer.write(self._greeting)
+            while True:
+                await subscriber.ready.wait()
+                subscriber.ready.clear()
+                frames = b"".join(subscriber.queue)
+                subscriber.queue.clear()
+                writer.write(frames)
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self._subscribers.discard(subscriber)
+            writer.close()
+            self.logger.info(f"stream subscriber {subscriber.peername} disconnected")
+
+
+class _Subscriber:
+    def __init__(self, peername, backlog):
+        self.peername = str(peername)
+        self.queue = collections.deque(maxlen=backlog)
+        self.ready = asyncio.Event()
+        self.dropped = 0
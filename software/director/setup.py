@@ -15,9 +15,9 @@ with open("README.md") as readme_file:
     readme = readme_file.read()
 
 
-requirements = ["yaqd-core", "yaqc", "simple-pid"]
+requirements = ["yaqd-core", "yaqc", "simple-pid", "numpy", "gas_uptake"]
 
-extra_requirements = {"dev": ["black", "pre-commit"]}
+extra_requirements = {"dev": ["black", "pre-commit"], "hdf5": ["h5py"]}
 extra_files = {"director": ["VERSION"]}
 
 setup(
@@ -0,0 +1,82 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from director._history import History
+
+
+def rows(n, width=3):
+    t = np.arange(n, dtype=float)
+    data = np.column_stack([t] + [np.sin(t / (10 + i)) for i in range(width - 1)])
+    return data
+
+
+def fill(history, data):
+    for row in data:
+        history.append(row)
+    return history
+
+
+@pytest.fixture
+def spilled(tmp_path):
+    # small chunks and memory, so queries cross chunk boundaries and memory maps
+    return fill(History(3, chunk_rows=7, memory_rows=14, directory=tmp_path), rows(100))
+
+
+def test_query_returns_rows_in_range(spilled):
+    out = spilled.query(10, 40, max_points=1000)
+    np.testing.assert_array_equal(out, rows(100)[10:41])
+    assert len(spilled) == 100
+    assert spilled.query(200, 300, 10).shape == (0, 3)
+
+
+def test_spilled_to_disk(spilled, tmp_path):
+    assert list(tmp_path.glob("history-*/*.npy"))
+    spilled.clear()
+    assert not list(tmp_path.glob("history-*"))
+    assert len(spilled) == 0
+
+
+@pytest.mark.parametrize("max_points", [1, 9, 30, 99])
+def test_mean_matches_reference(spilled, max_points):
+    data = rows(100)[5:95]
+    out = spilled.query(5, 94, max_points)
+    bin_size = -(-len(data) // max_points)
+    expected = [data[i : i + bin_size].mean(axis=0) for i in range(0, len(data), bin_size)]
+    assert len(out) <= max_points
+    np.testing.assert_allclose(out, expected)
+
+
+def test_minmax_keeps_extremes(spilled):
+    data = rows(100)
+    out = spilled.query(0, 99, max_points=20, method="minmax")
+    assert len(out) <= 20
+    bin_size = -(-100 // 10)
+    for k in range(10):
+        block = data[k * bin_size : (k + 1) * bin_size]
+        lo, hi = out[2 * k], out[2 * k + 1]
+        assert (lo[0], hi[0]) == (block[0, 0], block[-1, 0])
+        np.testing.assert_array_equal(lo[1:], block[:, 1:].min(axis=0))
+        np.testing.assert_array_equal(hi[1:], block[:, 1:].max(axis=0))
+
+
+def test_all_nan_bins_stay_nan():
+    data = rows(20)
+    data[:10, 1] = np.nan
+    history = fill(History(3, chunk_rows=4), data)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        out = history.query(0, 19, max_points=2)
+    assert np.isnan(out[0, 1]) and not np.isnan(out[1, 1])
+
+
+def test_invalid_method():
+    with pytest.raises(ValueError):
+        History(2).query(0, 1, 10, method="median")
+
+
+@pytest.mark.parametrize("max_points, method", [(0, "mean"), (-1, "mean"), (1, "minmax")])
+def test_too_few_points(spilled, max_points, method):
+    with pytest.raises(ValueError):
+        spilled.query(0, 99, max_points, method=method)
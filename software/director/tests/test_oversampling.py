@@ -0,0 +1,74 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from director._oversampling import Oversampler
+
+
+class FakeAcquisition:
+    """Hands out queued readings for one device, then repeats the last one."""
+
+    def __init__(self, name, readings):
+        self.name = name
+        self.readings = list(readings)
+
+    async def get_measured(self, names=None):
+        reading = self.readings.pop(0) if len(self.readings) > 1 else self.readings[0]
+        return {self.name: reading}
+
+
+def reading(i, value):
+    return {"measurement_id": i, "channel_0": value, "channel_1": 2 * value}
+
+
+@pytest.mark.parametrize("method", Oversampler.methods)
+def test_initial_reading_without_channels(method):
+    # yaqd-core reports {'measurement_id': 0} until the first measurement completes
+    oversampler = Oversampler(None, ["a"], method=method, alpha=1.0)
+    oversampler._ok["a"] = True
+    oversampler._append("a", {"measurement_id": 0})
+    measured, _ = oversampler.reduce()
+    assert measured["a"] is None
+    oversampler._append("a", reading(1, 4.0))
+    measured, spread = oversampler.reduce()
+    assert measured["a"] == {"channel_0": 4.0, "channel_1": 8.0}
+    assert set(spread["a"]) == {"channel_0", "channel_1"}
+
+
+def test_sample_task_skips_initial_reading():
+    readings = [{"measurement_id": 0}, reading(1, 1.0), reading(2, 3.0)]
+    oversampler = Oversampler(FakeAcquisition("a", readings), ["a"], interval=0)
+
+    async def run():
+        task = asyncio.ensure_future(oversampler.run())
+        for _ in range(10):
+            await asyncio.sleep(0)
+        task.cancel()
+
+    asyncio.run(run())
+    measured, spread = oversampler.reduce()
+    assert measured["a"] == {"channel_0": 2.0, "channel_1": 4.0}
+    assert spread["a"]["channel_0"] == pytest.approx(1.0)
+
+
+def test_channels_change_after_restart():
+    oversampler = Oversampler(None, ["a"], method="boxcar")
+    oversampler._ok["a"] = True
+    oversampler._append("a", reading(1, 1.0))
+    oversampler._append("a", {"measurement_id": 1, "channel_0": 5.0})
+    measured, _ = oversampler.reduce()
+    assert measured["a"] == {"channel_0": 5.0}
+
+
+@pytest.mark.parametrize("method", ["mean", "median"])
+def test_reuses_latest_sample_between_readings(method):
+    oversampler = Oversampler(None, ["a"], method=method)
+    oversampler._ok["a"] = True
+    for i, value in enumerate([1.0, 2.0, 6.0]):
+        oversampler._append("a", reading(i + 1, value))
+    measured, _ = oversampler.reduce()
+    assert measured["a"]["channel_0"] == (3.0 if method == "mean" else 2.0)
+    measured, spread = oversampler.reduce()
+    assert measured["a"]["channel_0"] == 6.0
+    assert np.isnan(spread["a"]["channel_0"])
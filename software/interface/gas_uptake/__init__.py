@@ -0,0 +1 @@
+from .__version__ import *
@@ -5,7 +5,6 @@ import subprocess
 import os
 import tomli
 
-from ._main_window import main as begin
 from .__version__ import __version__
 
 
@@ -40,8 +39,66 @@ def edit_config():
                 break
 
 
+@main.command(name="convert")
+@click.argument("paths", nargs=-1, type=click.Path(exists=True, dir_okay=False))
+def convert(paths):
+    """Convert tab-separated record files to HDF5, next to the originals."""
+    from .recording import convert_text_to_hdf5
+
+    for path in paths:
+        click.echo(convert_text_to_hdf5(path))
+
+
+@main.command(name="catalog")
+@click.argument("directory", required=False, type=click.Path(exists=True, file_okay=False))
+@click.option("--since", type=click.DateTime(), help="Runs still going at or after this time.")
+@click.option("--until", type=click.DateTime(), help="Runs started at or before this time.")
+@click.option("--version", "version", help="gas-uptake version that wrote the record.")
+@click.option("--min-rows", type=int, help="Fewest rows.")
+@click.option("--min-temperature", type=float, help="Lowest mean temperature, C.")
+@click.option("--max-temperature", type=float, help="Highest mean temperature, C.")
+@click.option("--name", help="Substring of the file name.")
+@click.option("--channels", is_flag=True, help="Also list per channel statistics.")
+@click.option("--no-update", is_flag=True, help="Search without rescanning the directory first.")
+def catalog(directory, channels, no_update, **filters):
+    """Search the recorded runs in DIRECTORY, by default the gas-uptake-data folder on the desktop.
+
+    New and changed records are indexed first; unchanged ones are not read again.
+    """
+    import datetime
+    from .catalog import Catalog
+
+    if directory is None:
+        directory = platformdirs.user_desktop_path() / "gas-uptake-data"
+    with Catalog(directory) as c:
+        if not no_update:
+            c.update(
+                directory, on_error=lambda path, e: click.echo(f"skipping {path}: {e}", err=True)
+            )
+        for run in c.search(**filters):
+            start = datetime.datetime.fromtimestamp(run["start"]).strftime("%Y-%m-%d %H:%M")
+            hours = (run["end"] - run["start"]) / 3600
+            temperature = (
+                "-" if run["temperature_mean"] is None else f"{run['temperature_mean']:.1f} C"
+            )
+            name = os.path.basename(run["path"])
+            click.echo(f"{start}  {hours:7.2f} h  {run['rows']:8d} rows  {temperature:>8}  {name}")
+            if channels:
+                for channel in c.channels(run["path"]):
+                    if channel["initial"] is None:
+                        continue
+                    click.echo(
+                        f"    {channel['column']:>12}  {channel['initial']:8.2f}"
+                        f" -> {channel['final']:8.2f} PSI"
+                        f"  uptake {channel['uptake']:8.2f} PSI"
+                    )
+
+
 @main.command(name="run")
 def _run():
+    # Qt, pyqtgraph and numpy are only imported here, other commands start instantly
+    from ._main_window import main as begin
+
     # create app data directory
     d = os.path.join(platformdirs.user_data_dir(), "gas-uptake")
     if not os.path.isdir(d):
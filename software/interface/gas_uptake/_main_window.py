@@ -1,39 +1,55 @@
 import os
 import re
+import logging
 import platformdirs
 import tomli
 import time
 import datetime
 import sys
 import pathlib
+import threading
 import numpy as np
 import pyqtgraph as pg
 import qtypes
-import yaqc
 from functools import partial
 from qtpy import QtCore, QtGui, QtWidgets
-import yaqc_bluesky
 from .__version__ import *
 from ._persistant_state import PersistantState
+from .recording import open_record_writer, RunJournal
+from .io import load
+from .catalog import add_to_catalog
+from .metrics import Metrics
+from .online import UptakeMonitor
+from .ring_buffer import RingBuffer
+from ._plotting import MinMaxDecimator, RunningMax
+from ._poll_worker import PollWorker, board_configs, create_calibration
 
 
 __here__ = pathlib.Path(__file__).absolute().parent
+logger = logging.getLogger(__name__)
 
 
-with open(__here__ / "colors.txt", "r") as f:
-    colors = [line.strip() for line in f]
+def load_colors():
+    with open(__here__ / "colors.txt", "r") as f:
+        return [line.strip() for line in f]
 
 
-# make persistant state if it doesn't exist
-persistant_state_path = platformdirs.user_data_path("gas_uptake") / "state.toml"
-persistant_state_path.parent.mkdir(parents=True, exist_ok=True)
-persistant_state_path.touch(exist_ok=True)
+def persistant_state_path():
+    """Path of the persistant state file, created if it doesn't exist."""
+    path = platformdirs.user_data_path("gas_uptake") / "state.toml"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch(exist_ok=True)
+    return path
 
 
 class MainWindow(QtWidgets.QMainWindow):
+    temperature_requested = QtCore.Signal(float)
+    pid_gains_requested = QtCore.Signal(float, float, float)
+
     def __init__(self, app, config):
         super().__init__()
         self.app = app
+        self.config = config
         self.__version__ = __version__
         # title
         title = "Gas Uptake Reactor Control"
@@ -41,28 +57,63 @@ class MainWindow(QtWidgets.QMainWindow):
         title += " | Python %i.%i" % (sys.version_info[0], sys.version_info[1])
         self.setWindowTitle(title)
         # state
-        self._state = PersistantState(persistant_state_path)
-        for i in range(12):
-            k = f"tare_pressure_{i}"
-            if k not in self._state:
-                self._state[k] = 0.0
+        self._state = PersistantState(persistant_state_path())
+        self.calibration = create_calibration(config)
+        self.n_transducers = len(self.calibration)
+        with self._state:
+            for i in range(self.n_transducers):
+                k = f"tare_pressure_{i}"
+                if k not in self._state:
+                    self._state[k] = 0.0
+        self.calibration.tare[:] = [
+            self._state[f"tare_pressure_{i}"] for i in range(self.n_transducers)
+        ]
         # yaq
-        self.data = np.full((14, 10000), np.nan)
+        self.data = RingBuffer(config.get("history_length", 10000), 2 + self.n_transducers)
+        self._decimator = MinMaxDecimator(self.data)
+        self._pressure_max = RunningMax(self.data.capacity)
+        self.uptake = UptakeMonitor(
+            self.n_transducers,
+            window=config.get("rate_window", 120),
+            alpha=config.get("rate_alpha", 0.1),
+            plateau_rate=config.get("plateau_rate", 1e-4),
+            plateau_time=config.get("plateau_time", 600.0),
+        )
         self.recording = False
-        self.temp_client = yaqc.Client(host=config["temp_client"]["host"], port=config["temp_client"]["port"])
-        self.pressure_clients = dict()
-        self.pressure_clients["current_sense_upper"] = yaqc.Client(host=config["current_sense_upper"]["host"],
-                                                               port=config["current_sense_upper"]["port"])
-        self.pressure_clients["current_sense_lower"] = yaqc.Client(host=config["current_sense_lower"]["host"],
-                                                               port=config["current_sense_lower"]["port"])
+        self._writer = None
+        self._journal = RunJournal(persistant_state_path().with_name("run.json"))
         self.record_started = time.time()
+        self._last_row_time = time.time()
+        self._last_error = ""
+        self.metrics = Metrics()
         #
         self._begin_poll_loop()
 
     def _begin_poll_loop(self):
-        self.poll_timer = QtCore.QTimer()
-        self.poll_timer.start(1000)  # milliseconds
-        self.poll_timer.timeout.connect(self.poll)
+        # acquisition runs in its own thread, rows arrive through queued signals
+        self.poll_worker = PollWorker(self.config, self.calibration, self.metrics)
+        self.poll_thread = QtCore.QThread()
+        self.poll_worker.moveToThread(self.poll_thread)
+        self.poll_thread.started.connect(self.poll_worker.start)
+        self.poll_worker.row_ready.connect(self.poll)
+        self.poll_worker.failed.connect(self._on_poll_failed)
+        self.poll_worker.degraded.connect(self._on_poll_degraded)
+        self.temperature_requested.connect(self.poll_worker.set_temperature)
+        self.pid_gains_requested.connect(self.poll_worker.set_pid_gains)
+        self.poll_worker.pid_gains_ready.connect(self._on_pid_gains)
+        self.poll_thread.start()
+        # watch for stale data
+        self.stale_timer = QtCore.QTimer()
+        self.stale_timer.timeout.connect(self._check_stale)
+        self.stale_timer.start(1000)  # milliseconds
+        # performance panel, and optional metrics file
+        self.metrics_timer = QtCore.QTimer()
+        self.metrics_timer.timeout.connect(self._update_metrics_panel)
+        self.metrics_timer.start(2000)  # milliseconds
+        if self.config.get("metrics_file"):
+            self.metrics_file_timer = QtCore.QTimer()
+            self.metrics_file_timer.timeout.connect(self._dump_metrics)
+            self.metrics_file_timer.start(int(self.config.get("metrics_interval", 60) * 1000))
 
     def create_central_widget(self):
         splitter = QtWidgets.QSplitter()
@@ -78,6 +129,10 @@ class MainWindow(QtWidgets.QMainWindow):
         recording_node.append(self.file_path_node)
         self.time_recorded_node = qtypes.String(label="Time Recorded")
         recording_node.append(self.time_recorded_node)
+        self.status_node = qtypes.String(label="Status", value="waiting for data")
+        recording_node.append(self.status_node)
+        self.finished_node = qtypes.String(label="Finished Reactors", value="")
+        recording_node.append(self.finished_node)
         self.root_item.append(recording_node)
         # temperature
         temp_node = qtypes.Null(label="Temperature")
@@ -87,22 +142,38 @@ class MainWindow(QtWidgets.QMainWindow):
         self.temp_setpoint.set_value(0.0)
         temp_node.append(self.temp_setpoint)
         temp_advanced_node = qtypes.Null(label="Advanced")
-        temp_advanced_node.append(qtypes.Float("P"))
-        temp_advanced_node.append(qtypes.Float("I"))
-        temp_advanced_node.append(qtypes.Float("D"))
+        # enabled once the temperature daemon reports its gains
+        self.pid_nodes = [qtypes.Float(label, disabled=True) for label in "PID"]
+        for node in self.pid_nodes:
+            node.edited_connect(self._on_pid_edited)
+            temp_advanced_node.append(node)
         temp_node.append(temp_advanced_node)
         self.root_item.append(temp_node)
         # pressure
         self.pressure_node = qtypes.Null(label="Pressure")
-        for i in range(12):
+        for i in range(self.n_transducers):
             node = qtypes.Float(label=f"Transducer {i}", units="PSI")
             node.append(qtypes.Float("Offset", units="PSI", value=self._state[f"tare_pressure_{i}"], disabled=True))
             node.append(qtypes.Float("Tare Value", units="PSI", value=0.0))
             button = qtypes.Button(f"Tare Transducer {i} Now")
             button.updated_connect(self._on_tare)
             node.append(button)
+            node.append(qtypes.Float("Rate", units="PSI/min", disabled=True))
+            node.append(qtypes.Bool("Finished", disabled=True))
             self.pressure_node.append(node)
         self.root_item.append(self.pressure_node)
+        # performance
+        self.metrics_node = qtypes.Null(label="Performance")
+        self.metrics_nodes = dict()
+        stages = ["acquire_temperature"]
+        stages += [f"acquire_{name}" for name in board_configs(self.config)]
+        stages += ["convert", "write", "flush", "uptake", "plot"]
+        stages += ["poll", "poll_jitter", "poll_missed"]
+        for stage in stages:
+            node = qtypes.String(label=stage, value="")
+            self.metrics_nodes[stage] = node
+            self.metrics_node.append(node)
+        self.root_item.append(self.metrics_node)
         # graph
         self.graph = self._create_graph()
         splitter.addWidget(self.graph)
@@ -118,27 +189,80 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def _create_data_file(self):
         now = datetime.datetime.now()
-        fname = "gas-uptake_" + now.strftime("%Y-%m-%d_%H-%M-%S") + ".txt"
+        fname = "gas-uptake_" + now.strftime("%Y-%m-%d_%H-%M-%S")
         data_directory = platformdirs.user_desktop_path() / "gas-uptake-data"
-        fp = data_directory / fname
-        tab = "\t"
-        newline = "\n"
-        with open(fp, "a") as f:
-            f.write("timestamp:" + tab + "'" + now.isoformat() + "'" + newline)
-            f.write("gas-uptake version:" + tab + "'" +  __version__ + "'" + newline)
-            f.write("please cite yaq:" + tab + "https://doi.org/10.1063/5.0135255" + newline)
-            f.write("please cite bluesky:" + tab + "https://doi.org/10.1080/08940886.2019.1608121" + newline)
-            f.write("temperature units:" + tab + "'C'" + newline)
-            f.write("pressure units:" + tab + "'PSI'" + newline)
-            for k, v in self._state.items():
-                f.write(k + tab + str(v) + newline)
-            f.write("column:" + tab + "[")
-            f.write("'labtime'")
-            f.write(tab + "'temperature'")
-            for i in range(12):
-                f.write(tab + f"'pressure_{i}'")
-            f.write("]" + newline)
-        return fp
+        header = dict()
+        header["timestamp"] = now.isoformat()
+        header["gas-uptake version"] = __version__
+        header["please cite yaq"] = "https://doi.org/10.1063/5.0135255"
+        header["please cite bluesky"] = "https://doi.org/10.1080/08940886.2019.1608121"
+        header["temperature units"] = "C"
+        header["pressure units"] = "PSI"
+        header["temperature setpoint"] = self.temp_setpoint.get()["value"]
+        header.update(self._state)
+        self._writer = open_record_writer(
+            data_directory / fname,
+            header,
+            self._columns(),
+            format=self.config.get("record_format", "txt"),
+            metrics=self.metrics,
+        )
+        self._journal.begin(
+            self._writer.path,
+            header,
+            self._columns(),
+            format=self.config.get("record_format", "txt"),
+            setpoint=header["temperature setpoint"],
+            tare=list(self.calibration.tare),
+        )
+        return self._writer.path
+
+    def _columns(self):
+        return ["labtime", "temperature"] + [f"pressure_{i}" for i in range(self.n_transducers)]
+
+    def resume_recording(self):
+        """Continue the run that was being recorded when the program last stopped."""
+        try:
+            self._writer = self._journal.resume(
+                self._columns(), self.config.get("resume_max_gap", 3600.0), metrics=self.metrics
+            )
+        except Exception as e:
+            logger.exception(f"could not resume the run in {self._journal.path}")
+            self._journal.end()
+            self._last_error = f"could not resume recording: {e}"
+            return
+        if self._writer is None:
+            return
+        entry = self._journal.entry
+        # restore the setpoint and tares the run was last noted with
+        state = entry["state"]
+        tare = state.get("tare", [])
+        if len(tare) == self.n_transducers:
+            with self._state:
+                for i, value in enumerate(tare):
+                    self._state[f"tare_pressure_{i}"] = value
+            self.calibration.tare[:] = tare
+        self.temp_setpoint.set_value(state.get("setpoint", 0.0))
+        if len(entry["segments"]) == 1:
+            # same file, so the plot and uptake rates carry on where the run stopped
+            try:
+                for row in load(self._writer.path).data[-self.data.capacity :]:
+                    self.data.append(row)
+                    self._pressure_max.append(np.fmax.reduce(row[2:]))
+                    self.uptake.append(row[0], row[2:])
+            except Exception as e:
+                logger.exception(f"could not reload the plot from {self._writer.path}")
+                self._last_error = f"could not reload {self._writer.path}: {e}"
+        self.record_started = datetime.datetime.fromisoformat(
+            entry["header"]["timestamp"]
+        ).timestamp()
+        self.data_file_path = self._writer.path
+        self.file_path_node.set_value(str(self.data_file_path))
+        self.recording = True
+
+    def discard_interrupted_run(self):
+        """Forget the run that was being recorded when the program last stopped."""
+        self._journal.end()
 
     def _create_graph(self):
         pw = pg.PlotWidget()
@@ -146,8 +270,9 @@ class MainWindow(QtWidgets.QMainWindow):
         #
         self.graph_curves = {}
         self.graph_curves["temperature"] = pg.PlotCurveItem(name="temp.")
-        for i in range(12):
-            c = colors[i]
+        colors = load_colors()
+        for i in range(self.n_transducers):
+            c = colors[i % len(colors)]
             self.graph_curves[f"pressure_{i}"] = pg.PlotCurveItem(name=i, pen=(c))
         #
         self.p1 = pw.plotItem
@@ -161,7 +286,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.p1.getAxis("left").linkToView(self.p2)
         self.p2.setXLink(self.p1)
         self.p1.getAxis("left").setLabel("absolute pressure (PSI)")
-        for i in range(12):
+        for i in range(self.n_transducers):
             key = f"pressure_{i}"
             self.p2.addItem(self.graph_curves[key])
             self.p1.legend.addItem(self.graph_curves[key], i)
@@ -172,7 +297,10 @@ class MainWindow(QtWidgets.QMainWindow):
         self.recording = not self.recording
         if self.recording:
             # array
-            self.data = np.full((14, 10000), np.nan)
+            self.data.clear()
+            self._decimator.clear()
+            self._pressure_max.clear()
+            self.uptake.clear()
             self.record_started = time.time()
             # init data file
             self.data_file_path = self._create_data_file()
@@ -183,13 +311,80 @@ class MainWindow(QtWidgets.QMainWindow):
             #self.record_button.setText("STOP RECORDING")
         else:
             self.recording = False
+            self._journal.end()
+            self._writer.close()
+            # index in the background, reading a long record takes a moment
+            threading.Thread(
+                target=self._index_record, args=(self._writer.path,), daemon=True
+            ).start()
+            self._writer = None
             # button color
             self.record_button.set_background("#718c00")
             self.record_button.setText("BEGIN RECORDING")
-        self.poll_timer.start(1000)
+
+    def _index_record(self, path):
+        try:
+            add_to_catalog(path)
+        except Exception as e:
+            # runs on its own thread, the record itself is safe
+            logger.exception(f"could not add {path} to the catalog")
+            self._last_error = f"catalog: {e}"
+
+    def _check_stale(self):
+        age = time.time() - self._last_row_time
+        if age > 3 * self.poll_worker.period:
+            status = f"STALE: no data for {age:.0f} s"
+            if self._last_error:
+                status += f" ({self._last_error})"
+            self.status_node.set_value(status)
+
+    def _on_poll_failed(self, message):
+        self._last_error = message
+
+    def _on_poll_degraded(self, message):
+        # the row arrived, but some daemons did not answer
+        self._last_error = message
+        self.status_node.set_value(f"DEGRADED: {message}")
+
+    def _update_metrics_panel(self):
+        for name, stats in self.metrics.summary().items():
+            node = self.metrics_nodes.get(name)
+            if node is None:
+                continue
+            if "p50" not in stats:  # counter
+                node.set_value(f"{stats['count']:.0f}")
+            elif stats["count"]:
+                ms = {k: 1000 * v for k, v in stats.items()}
+                node.set_value(f"p50 {ms['p50']:.1f}  p99 {ms['p99']:.1f}  max {ms['max']:.1f} ms")
+
+    def _dump_metrics(self):
+        try:
+            self.metrics.dump(self.config["metrics_file"])
+        except OSError as e:
+            self._last_error = f"metrics file: {e}"
+
+    def closeEvent(self, event):
+        QtCore.QMetaObject.invokeMethod(
+            self.poll_worker, "stop", QtCore.Qt.BlockingQueuedConnection
+        )
+        self.poll_thread.quit()
+        self.poll_thread.wait()
+        if self._writer is not None:
+            # the journal stays, so the run resumes on the next start
+            self._writer.close()
+        self._state.flush()
+        super().closeEvent(event)
 
     def _on_temp_setpoint_updated(self, value):
-        self.temp_client.set_position(value["value"])
+        self.temperature_requested.emit(value["value"])
+        self._journal.note(setpoint=value["value"])
+
+    def _on_pid_edited(self, value):
+        self.pid_gains_requested.emit(*[node.get()["value"] for node in self.pid_nodes])
+
+    def _on_pid_gains(self, gains):
+        for node, key in zip(self.pid_nodes, ["kp", "ki", "kd"]):
+            node.set({"value": gains[key], "disabled": False})
 
     def _on_tare(self, value):
         print("on tare", value)
@@ -201,77 +396,53 @@ class MainWindow(QtWidgets.QMainWindow):
         actual = node[1].get()["value"]
         correction = actual - measured
         self._state[f"tare_pressure_{transducer_index}"] = correction
+        self.calibration.tare[transducer_index] = correction
+        self._journal.note(tare=list(self.calibration.tare))
 
-    def poll(self):
-        t = time.time()
-        row = np.full(14, np.nan)
-        # time
-        row[0] = time.time()
-        # temperature
-        row[1] = self.temp_client.get_position()
-        QtWidgets.QApplication.exec()
-        # pressure
-        raw = dict()
-        for k, v in self.pressure_clients.items():
-            raw[k] = v.get_measured()
-            QtWidgets.QApplication.exec()
-        measured_pressures = dict()
-        # this mapping makes little sense, but it's how it's wired
-        # deal with it
-        # ---Blaise 2024-02-13
-        measured_pressures[0] = raw["current_sense_upper"]["channel6"]
-        measured_pressures[1] = raw["current_sense_upper"]["channel5"]
-        measured_pressures[2] = raw["current_sense_upper"]["channel4"]
-        measured_pressures[3] = raw["current_sense_upper"]["channel3"]
-        measured_pressures[4] = raw["current_sense_lower"]["channel1"]
-        measured_pressures[5] = raw["current_sense_lower"]["channel0"]
-        measured_pressures[6] = raw["current_sense_upper"]["channel0"]
-        measured_pressures[7] = raw["current_sense_upper"]["channel1"]
-        measured_pressures[8] = raw["current_sense_lower"]["channel5"]
-        measured_pressures[9] = raw["current_sense_lower"]["channel4"]
-        measured_pressures[10] = raw["current_sense_lower"]["channel3"]
-        measured_pressures[11] = raw["current_sense_lower"]["channel2"]
-        for k, v in measured_pressures.items():
-            v *= 1000  # A to mA
-            v -= 4
-            v *= 150/20  # mA to PSI
-            if v < 0:
-                v = float("nan")
-            else:
-                v += self._state[f"tare_pressure_{k}"]
-            row[k+2] = v
+    def poll(self, row):
+        """Handle a row delivered by the poll worker."""
+        self._last_row_time = time.time()
+        self._last_error = ""
+        self.status_node.set_value("ok")
         # record
-        if self.recording:
-            with open(self.data_file_path, "a") as f:
-                for n in row:
-                    f.write("%8.6f" % n)
-                    f.write("\t")
-                f.write("\n")
-                QtWidgets.QApplication.exec()
+        with self.metrics.time("write"):
+            if self.recording:
+                self._writer.write(row)
         # finish
-        self.data = np.roll(self.data, shift=-1, axis=1)
-        self.data[:, -1] = row
-        self.update_plot()
-        self.update_widgets(row)
+        self.data.append(row)
+        self._pressure_max.append(np.fmax.reduce(row[2:]))
+        with self.metrics.time("uptake"):
+            self.uptake.append(row[0], row[2:])
+        with self.metrics.time("plot"):
+            self.update_plot()
+            self.update_widgets(row)
 
     def update_plot(self):
-        xi = self.data[0] - self.record_started
-        xi /= 60
-        self.graph_curves["temperature"].setData(x=xi, y=self.data[1])
-        for i in range(12):
-            self.graph_curves[f"pressure_{i}"].setData(x=xi, y=self.data[i + 2])
+        # at most two points per pixel, only new rows are decimated each tick
+        xs, ys = self._decimator.update(int(self.p1.vb.width()) or 1000)
+        xs -= self.record_started
+        xs /= 60
+        self.graph_curves["temperature"].setData(x=xs[0], y=ys[0])
+        for i in range(self.n_transducers):
+            self.graph_curves[f"pressure_{i}"].setData(x=xs[i + 1], y=ys[i + 1])
         #
         self.p2.setGeometry(self.p1.vb.sceneBoundingRect())
         self.p2.linkedViewChanged(self.p1.vb, self.p2.XAxis)
-        self.p2.setYRange(0, np.nanmax(self.data[2:]))
+        ymax = self._pressure_max.value
+        if not np.isnan(ymax):
+            self.p2.setYRange(0, ymax)
 
     def update_widgets(self, row):
         self.root_item[1][0].set_value(row[1])
         if self.recording:
             self.time_recorded_node.set_value(str(time.time() - self.record_started))
-        for i in range(12):
+        finished = self.uptake.finished
+        for i in range(self.n_transducers):
             self.root_item[2][i].set_value(row[i+2])
             self.root_item[2][i][0].set_value(self._state[f"tare_pressure_{i}"])
+            self.root_item[2][i][3].set_value(self.uptake.smoothed_rate[i] * 60)
+            self.root_item[2][i][4].set_value(bool(finished[i]))
+        self.finished_node.set_value(f"{finished.sum()} of {self.n_transducers}")
 
 def main():
     """Initialize application and main window."""
@@ -280,6 +451,10 @@ def main():
         config = tomli.load(f)
     main_window = MainWindow(app, config=config)
     main_window.create_central_widget()
+    if config.get("resume_recording", True):
+        main_window.resume_recording()
+    else:
+        main_window.discard_interrupted_run()
     main_window.showMaximized()
     sys.exit(app.exec_())
 
@@ -1,16 +1,114 @@
+import os
+import tempfile
+import threading
+
 import tomli
 import tomli_w
 
 
 class PersistantState(dict):
+    """Dictionary mirrored to a TOML file.
+
+    Assignments do not write immediately. The file is saved ``delay`` seconds after
+    the last change, on ``flush()``, or when leaving a ``with state:`` block, so a
+    burst of assignments costs one write. Saves go to a temporary file that is then
+    renamed over the original, so the file is never left half written.
 
-    def __init__(self, filepath):
+    Reads check the modification time of the file and reload it if it was edited
+    by someone else; keys changed locally and not yet saved win over the file.
+    """
+
+    def __init__(self, filepath, delay=1.0):
         self._filepath = filepath
+        self.delay = delay
+        self._lock = threading.RLock()
+        self._dirty = set()
+        self._depth = 0
+        self._timer = None
+        self._stat = None
+        self._load()
+
+    def __enter__(self):
+        with self._lock:
+            self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self._depth -= 1
+            if not self._depth:
+                self.flush()
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+            self._dirty.add(key)
+            if not self._depth:
+                self._schedule()
+
+    def __getitem__(self, key):
+        self._check_external()
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        self._check_external()
+        return super().__contains__(key)
+
+    def items(self):
+        self._check_external()
+        return super().items()
+
+    def flush(self):
+        """Save pending changes now."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            directory = os.path.dirname(os.path.abspath(self._filepath))
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".state-", suffix=".toml")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    tomli_w.dump(dict(self), f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self._filepath)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+            self._dirty.clear()
+            self._stat = self._file_stat()
+
+    def _schedule(self):
+        # debounce, each assignment pushes the save back by self.delay
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.delay, self.flush)
+        self._timer.start()
+
+    def _file_stat(self):
+        try:
+            st = os.stat(self._filepath)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self):
+        self._stat = self._file_stat()
         with open(self._filepath, "rb") as f:
             state = tomli.load(f)
+        pending = {k: super(PersistantState, self).__getitem__(k) for k in self._dirty}
+        super().clear()
         super().update(state)
+        super().update(pending)
 
-    def __setitem__(self, key, value):
-        super().__setitem__(key, value)
-        with open(self._filepath, "wb") as f:
-            tomli_w.dump(self, f)
+    def _check_external(self):
+        with self._lock:
+            stat = self._file_stat()
+            if stat is None or stat == self._stat:
+                return
+            try:
+                self._load()
+            except tomli.TOMLDecodeError:
+                pass  # mid-edit, try again once the file changes
@@ -0,0 +1,123 @@
+__all__ = ["MinMaxDecimator", "RunningMax"]
+
+
+import collections
+import math
+
+import numpy as np
+
+
+class MinMaxDecimator:
+    """Reduce a RingBuffer to at most two points per screen pixel.
+
+    Channel 0 of the buffer is used as x. Each bin of ``bin_size`` consecutive
+    rows becomes two points per channel, the minimum and the maximum, in the
+    order they occurred, so spikes survive decimation.
+
+    Bins are aligned to the absolute row count of the buffer, so once a bin is
+    complete it never changes. Complete bins are cached and only the rows
+    appended since the last call are decimated; the partially evicted first bin
+    and the still-filling last bin are recomputed each time.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.clear()
+
+    def clear(self):
+        self.bin_size = 1
+        self._next_bin = 0  # absolute index of the first bin not yet cached
+        self._bins = collections.deque()  # absolute bin index of each cached bin
+        self._xs = np.empty((self.buffer.width - 1, 0))
+        self._ys = np.empty((self.buffer.width - 1, 0))
+
+    def update(self, n_pixels):
+        """Decimate for a plot ``n_pixels`` wide.
+
+        Returns
+        -------
+        xs, ys : numpy.ndarray
+            Arrays of shape (width - 1, points), one line per buffer channel after x.
+        """
+        count = self.buffer.count
+        oldest = count - len(self.buffer)
+        data = self.buffer.view()
+        # bin size, rounded up to a power of two so it changes rarely
+        bin_size = 2 ** max(math.ceil(math.log2(max(len(self.buffer), 1) / max(n_pixels, 1))), 0)
+        if bin_size != self.bin_size or self._next_bin * bin_size < oldest:
+            self.clear()
+            self.bin_size = bin_size
+            self._next_bin = -(-oldest // bin_size)
+        b = self.bin_size
+        # decimate newly completed bins
+        stop_bin = count // b
+        if stop_bin > self._next_bin:
+            start = self._next_bin * b - oldest
+            xs, ys = self._decimate(data[:, start : stop_bin * b - oldest], b)
+            self._xs = np.concatenate([self._xs, xs], axis=1)
+            self._ys = np.concatenate([self._ys, ys], axis=1)
+            self._bins.extend(range(self._next_bin, stop_bin))
+            self._next_bin = stop_bin
+        # forget bins that have been (partially) evicted
+        dropped = 0
+        while self._bins and self._bins[0] * b < oldest:
+            self._bins.popleft()
+            dropped += 1
+        if dropped:
+            self._xs = self._xs[:, 2 * dropped :]
+            self._ys = self._ys[:, 2 * dropped :]
+        # assemble
+        first = self._bins[0] * b if self._bins else self._next_bin * b
+        head = self._decimate(data[:, : max(min(first, count) - oldest, 0)], None)
+        tail = self._decimate(data[:, self._next_bin * b - oldest :], None)
+        xs = np.concatenate([head[0], self._xs, tail[0]], axis=1)
+        ys = np.concatenate([head[1], self._ys, tail[1]], axis=1)
+        return xs, ys
+
+    def _decimate(self, block, bin_size):
+        channels = block.shape[0] - 1
+        if block.shape[1] == 0:
+            return np.empty((channels, 0)), np.empty((channels, 0))
+        if bin_size is None:
+            bin_size = block.shape[1]
+        k = block.shape[1] // bin_size
+        x = block[0]
+        y = block[1:].reshape(channels, k, bin_size)
+        nan = np.isnan(y)
+        lo = np.where(nan, np.inf, y).argmin(axis=2)
+        hi = np.where(nan, -np.inf, y).argmax(axis=2)
+        index = np.stack([np.minimum(lo, hi), np.maximum(lo, hi)], axis=2).reshape(channels, 2 * k)
+        index += np.repeat(np.arange(k) * bin_size, 2)
+        ys = np.take_along_axis(block[1:], index, axis=1)
+        xs = x[index]
+        return xs, ys
+
+
+class RunningMax:
+    """Maximum of the last ``window`` values, O(1) amortized per value.
+
+    NaN values take up a place in the window but never become the maximum.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.clear()
+
+    def clear(self):
+        self._candidates = collections.deque()  # (index, value), values decreasing
+        self._count = 0
+
+    def append(self, value):
+        if not math.isnan(value):
+            while self._candidates and self._candidates[-1][1] <= value:
+                self._candidates.pop()
+            self._candidates.append((self._count, value))
+        self._count += 1
+        while self._candidates and self._candidates[0][0] <= self._count - 1 - self.window:
+            self._candidates.popleft()
+
+    @property
+    def value(self):
+        if not self._candidates:
+            return float("nan")
+        return self._candidates[0][1]
@@ -0,0 +1,191 @@
+__all__ = ["PollWorker", "board_configs", "create_calibration"]
+
+
+import time
+
+import numpy as np
+from qtpy import QtCore
+
+from .calibration import Calibration
+from .clients import ManagedClient, start_measuring
+from .metrics import Metrics
+
+
+# this mapping makes little sense, but it's how it's wired
+# deal with it
+# ---Blaise 2024-02-13
+default_channel_map = [
+    ("current_sense_upper", "channel6"),
+    ("current_sense_upper", "channel5"),
+    ("current_sense_upper", "channel4"),
+    ("current_sense_upper", "channel3"),
+    ("current_sense_lower", "channel1"),
+    ("current_sense_lower", "channel0"),
+    ("current_sense_upper", "channel0"),
+    ("current_sense_upper", "channel1"),
+    ("current_sense_lower", "channel5"),
+    ("current_sense_lower", "channel4"),
+    ("current_sense_lower", "channel3"),
+    ("current_sense_lower", "channel2"),
+]
+
+
+def board_configs(config):
+    """Pressure sensor daemons of the GUI config, by name.
+
+    Taken from the ``boards`` array of tables (``name``, ``host``, ``port`` and
+    optionally ``channels``) if present, otherwise from the ``current_sense_upper``
+    and ``current_sense_lower`` tables of older configs.
+    """
+    if "boards" in config:
+        return {board["name"]: board for board in config["boards"]}
+    return {name: config[name] for name in ["current_sense_upper", "current_sense_lower"]}
+
+
+def create_calibration(config):
+    """Calibration from the ``calibration`` table of the GUI config.
+
+    Without explicit calibration channels, transducers follow the ``channels`` of each
+    board in order, or the wiring of the original reactor for older configs. A board
+    without channels is then an error, rather than a board that is never read.
+    """
+    if "boards" in config:
+        explicit = "channels" in (config.get("calibration") or dict())
+        default_map = []
+        for board in config["boards"]:
+            channels = board.get("channels", [])
+            if not channels and not explicit:
+                raise ValueError(f"board {board['name']!r} has no channels")
+            default_map += [(board["name"], key) for key in channels]
+    else:
+        default_map = default_channel_map
+    return Calibration.from_config(
+        config.get("calibration"), default_map=default_map, input_scale=1000  # A to mA
+    )
+
+
+class PollWorker(QtCore.QObject):
+    """Poll the yaq daemons from a background thread.
+
+    Move to a QThread and connect ``QThread.started`` to ``start``. Every poll period
+    the worker queries all daemons, converts the readings to a row and emits it
+    through ``row_ready``. The blocking network calls never touch the UI thread.
+
+    Clients reconnect by themselves (``gas_uptake.clients.ManagedClient``). While a
+    daemon is down its channels read NaN, rows keep coming, and ``degraded`` is
+    emitted after each such row with the failures.
+
+    Timings go to ``metrics``: ``acquire_<client>`` for each daemon, ``convert``,
+    ``poll`` for the whole cycle and ``poll_jitter`` for the deviation of each tick
+    from the period. Ticks lost while a slow poll blocked the thread count as
+    ``poll_missed``.
+    """
+
+    row_ready = QtCore.Signal(object)
+    failed = QtCore.Signal(str)
+    degraded = QtCore.Signal(str)
+    pid_gains_ready = QtCore.Signal(object)
+
+    def __init__(self, config, calibration, metrics=None):
+        super().__init__()
+        self.config = config
+        self.calibration = calibration
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.period = config.get("poll_period", 1.0)
+        self._last_tick = None
+        self._connect()
+
+    @QtCore.Slot()
+    def start(self):
+        # timer is created here so that it lives in the worker thread
+        self.poll_timer = QtCore.QTimer(self)
+        self.poll_timer.timeout.connect(self.poll)
+        self.poll_timer.start(int(self.period * 1000))  # milliseconds
+
+    def _connect(self):
+        # nothing is opened here, clients connect on first use
+        config = self.config
+        self.pressure_clients = dict()
+        for name, board in board_configs(config).items():
+            self.pressure_clients[name] = ManagedClient(
+                board.get("host", "127.0.0.1"),
+                board["port"],
+                name=name,
+                on_connect=start_measuring,
+            )
+        temp = config["temp_client"]
+        self.temp_client = ManagedClient(
+            temp.get("host", "127.0.0.1"), temp["port"], name="temperature"
+        )
+        self._pid_checked = False
+
+    def _check_pid(self):
+        # only the gas uptake director exposes its PID
+        if self.temp_client.has_message("get_pid_gains"):
+            self.pid_gains_ready.emit(self.temp_client.get_pid_gains())
+        self._pid_checked = True
+
+    @QtCore.Slot()
+    def stop(self):
+        self.poll_timer.stop()
+
+    @QtCore.Slot(float)
+    def set_temperature(self, value):
+        try:
+            self.temp_client.set_position(value)
+        except Exception as e:
+            self.failed.emit(f"set temperature: {e}")
+
+    @QtCore.Slot(float, float, float)
+    def set_pid_gains(self, kp, ki, kd):
+        try:
+            self.temp_client.set_pid_gains(kp, ki, kd)
+        except Exception as e:
+            self.failed.emit(f"set PID gains: {e}")
+        else:
+            self.pid_gains_ready.emit(self.temp_client.get_pid_gains())
+
+    @QtCore.Slot()
+    def poll(self):
+        now = time.monotonic()
+        if self._last_tick is not None:
+            interval = now - self._last_tick
+            self.metrics.record("poll_jitter", abs(interval - self.period))
+            missed = round(interval / self.period) - 1
+            if missed > 0:
+                self.metrics.increment("poll_missed", missed)
+        self._last_tick = now
+        try:
+            with self.metrics.time("poll"):
+                row, errors = self._poll()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.row_ready.emit(row)
+            if errors:
+                self.degraded.emit("; ".join(errors))
+
+    def _poll(self):
+        row = np.full(2 + len(self.calibration), np.nan)
+        errors = []
+        # time
+        row[0] = time.time()
+        # temperature
+        with self.metrics.time("acquire_temperature"):
+            try:
+                if not self._pid_checked:
+                    self._check_pid()
+                row[1] = self.temp_client.get_position()
+            except Exception as e:
+                errors.append(f"temperature: {e}")
+        # pressure, failed boards read NaN
+        raw = dict()
+        for k, v in self.pressure_clients.items():
+            with self.metrics.time(f"acquire_{k}"):
+                try:
+                    raw[k] = v.get_measured()
+                except Exception as e:
+                    errors.append(f"{k}: {e}")
+        with self.metrics.time("convert"):
+            row[2:] = self.calibration.convert(self.calibration.gather(raw))
+        return row, errors
@@ -0,0 +1,195 @@
+"""Conversion of raw transducer currents to pressure, shared by the director and the GUI.
+
+Pressure transducers output 4-20 mA. For each transducer the pipeline is
+
+1. pick its reading out of the measured dictionaries of the current sense boards
+2. scale to mA (``input_scale``) and subtract the current ``offsets`` (mA)
+3. convert to PSI, linearly (``zero`` mA, ``gain`` PSI/mA) or through the
+   calibration curve of that transducer when one is given
+4. discard negative pressures (NaN) and add the ``tare`` (PSI)
+
+Every step operates on whole arrays, so one call converts a single frame of shape
+(transducers,) or a whole recording of shape (rows, transducers).
+"""
+
+
+__all__ = ["Calibration", "load_curves"]
+
+
+import warnings
+
+import numpy as np
+
+
+class Calibration:
+    """Channel map and calibration of a bank of pressure transducers.
+
+    Parameters
+    ----------
+    channel_map : list of (str, str)
+        Device name and measured key for each transducer, in transducer order.
+    input_scale : float
+        Factor from device units to mA, e.g. 1000 for devices reporting amps.
+    zero : float or array
+        Current at zero pressure, mA.
+    gain : float or array
+        PSI per mA.
+    curves : dict, optional
+        Transducer index to calibration points, an array of shape (n, 2) of
+        (mA, PSI) pairs sorted by current. Overrides ``zero`` and ``gain`` for
+        that transducer; readings are linearly interpolated between points.
+    logger : logging.Logger, optional
+        Where ``gather`` reports channels missing from a reading. Warnings are
+        issued when not given.
+    """
+
+    def __init__(
+        self, channel_map, input_scale=1.0, zero=4.0, gain=150 / 20, curves=None, logger=None
+    ):
+        self.channel_map = list(channel_map)
+        self.logger = logger
+        n = len(self.channel_map)
+        self.input_scale = input_scale
+        self.zero = np.broadcast_to(np.asarray(zero, dtype=float), (n,)).copy()
+        self.gain = np.broadcast_to(np.asarray(gain, dtype=float), (n,)).copy()
+        self.offsets = np.zeros(n)
+        self.tare = np.zeros(n)
+        self.curves = dict()
+        for i, points in (curves or dict()).items():
+            self.curves[int(i)] = np.asarray(points, dtype=float)
+        # device -> (transducer indices, measured keys), for gather
+        self._lookup = dict()
+        for i, (device, key) in enumerate(self.channel_map):
+            indices, keys = self._lookup.setdefault(device, ([], []))
+            indices.append(i)
+            keys.append(key)
+        self._missing = dict()  # device -> keys last reported missing
+
+    def __len__(self):
+        return len(self.channel_map)
+
+    @classmethod
+    def from_config(cls, config, default_map, input_scale=1.0, logger=None):
+        """Create from a ``calibration`` config table, falling back to defaults.
+
+        The table may contain ``input_scale``, ``curves``, the path of a curve file
+        (see ``load_curves``), and ``channels``, an array of tables with ``device``,
+        ``key`` and optionally ``serial``, one per transducer in order. Transducers
+        whose serial appears in the curve file get that calibration curve.
+        """
+        config = config or dict()
+        if config.get("curves"):
+            curves = load_curves(config["curves"])
+        else:
+            curves = dict()
+        channels = config.get("channels")
+        if channels is None:
+            channel_map = default_map
+            serials = [None] * len(channel_map)
+        else:
+            channel_map = [(c["device"], c["key"]) for c in channels]
+            serials = [c.get("serial") for c in channels]
+        selected = {i: curves[str(s)] for i, s in enumerate(serials) if str(s) in curves}
+        return cls(
+            channel_map,
+            input_scale=config.get("input_scale", input_scale),
+            curves=selected,
+            logger=logger,
+        )
+
+    def gather(self, measured):
+        """Collect raw readings from measured dictionaries into one array.
+
+        Parameters
+        ----------
+        measured : dict
+            Device name to measured dictionary. Missing devices, devices
+            mapped to None and missing keys give NaN for their transducers.
+            Keys missing from a reading that has some of the others are reported
+            once, when they go missing, as they mean data is lost even though
+            the device answered.
+
+        Returns
+        -------
+        numpy.ndarray
+            Raw readings in device units, shape (transducers,).
+        """
+        out = np.full(len(self), np.nan)
+        for device, (indices, keys) in self._lookup.items():
+            m = measured.get(device)
+            if m is None:
+                continue
+            out[indices] = [m.get(k, np.nan) for k in keys]
+            missing = [k for k in keys if k not in m]
+            if len(missing) == len(keys):
+                continue  # nothing measured yet, like the first reading of a daemon
+            if missing and missing != self._missing.get(device):
+                message = f"{device} reading has no {', '.join(missing)}, recorded as NaN"
+                if self.logger is not None:
+                    self.logger.warning(message)
+                else:
+                    warnings.warn(message, RuntimeWarning)
+            self._missing[device] = missing
+        return out
+
+    def current(self, raw):
+        """Raw readings in device units to offset-corrected current, mA."""
+        return np.asarray(raw, dtype=float) * self.input_scale - self.offsets
+
+    def convert(self, raw):
+        """Raw readings in device units to pressure, PSI.
+
+        ``raw`` has transducers along its last axis.
+        """
+        return self._pressure(self.current(raw))
+
+    def invert(self, psi):
+        """Pressure in PSI back to offset-corrected current, mA.
+
+        Inverse of ``convert`` after offsets, for reprocessing recorded data.
+        """
+        psi = np.asarray(psi, dtype=float) - self.tare
+        ma = psi / self.gain + self.zero
+        for i, points in self.curves.items():
+            ma[..., i] = np.interp(
+                psi[..., i], points[:, 1], points[:, 0], left=np.nan, right=np.nan
+            )
+        return ma
+
+    def recalibrate(self, psi, new):
+        """Convert pressures recorded with this calibration to calibration ``new``.
+
+        Offsets are assumed unchanged; differing tares, gains and curves are applied.
+        """
+        return new._pressure(self.invert(psi))
+
+    def _pressure(self, ma):
+        psi = (ma - self.zero) * self.gain
+        for i, points in self.curves.items():
+            psi[..., i] = np.interp(
+                ma[..., i], points[:, 0], points[:, 1], left=np.nan, right=np.nan
+            )
+        with np.errstate(invalid="ignore"):
+            psi[psi < 0] = np.nan
+        return psi + self.tare
+
+
+def load_curves(path):
+    """Read transducer calibration curves from a TOML file.
+
+    The file has one table per transducer serial number, each with ``points``, a
+    list of [mA, PSI] pairs transcribed from its calibration sheet::
+
+        [506146]
+        points = [[4.0, 0.0], [12.0, 75.1], [20.0, 150.0]]
+
+    Returns
+    -------
+    dict
+        Serial number (str) to array of shape (n, 2).
+    """
+    import tomli
+
+    with open(path, "rb") as f:
+        table = tomli.load(f)
+    return {str(k): np.asarray(v["points"], dtype=float) for k, v in table.items()}
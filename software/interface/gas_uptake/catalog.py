@@ -0,0 +1,296 @@
+"""SQLite index of the record files in a data directory.
+
+Each record gets one row in ``runs``: start and end time, row count, version,
+temperature setpoint and range, tare offsets and the full header. Each pressure
+column gets one row in ``channels`` with summary statistics. Files are only read
+again when their size or modification time changes, so keeping the catalog up to
+date over years of data costs one ``stat`` per file.
+"""
+
+
+__all__ = ["CATALOG_NAME", "Catalog", "add_to_catalog"]
+
+
+import datetime
+import json
+import pathlib
+import sqlite3
+
+import numpy as np
+
+from .io import load
+
+
+CATALOG_NAME = "catalog.sqlite"
+_schema_version = 1
+_schema = """
+create table runs (
+    path text primary key,
+    size integer,
+    mtime real,
+    start real,
+    end real,
+    rows integer,
+    version text,
+    setpoint real,
+    temperature_min real,
+    temperature_max real,
+    temperature_mean real,
+    tare text,
+    header text
+);
+create table channels (
+    path text references runs(path) on delete cascade,
+    column text,
+    initial real,
+    final real,
+    min real,
+    max real,
+    mean real,
+    uptake real,
+    primary key (path, column)
+);
+create index runs_start on runs(start);
+"""
+_patterns = ["gas-uptake_*.txt", "gas-uptake_*.h5"]
+
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _stats(values):
+    """First, last, min, max and mean of the non-NaN values, None if there are none."""
+    values = np.asarray(values, dtype=float).ravel()
+    values = values[~np.isnan(values)]
+    if not values.size:
+        return [None] * 5
+    return [float(x) for x in (values[0], values[-1], values.min(), values.max(), values.mean())]
+
+
+def _summarize(path):
+    """Run and channel rows of one record file."""
+    stat = path.stat()  # before reading, so rows appended meanwhile count as a change
+    record = load(path)
+    header = record.header
+    if len(record):
+        start, end = float(record["labtime"][0]), float(record["labtime"][-1])
+    else:
+        start = end = datetime.datetime.fromisoformat(header["timestamp"]).timestamp()
+    # the GUI stores tares in PSI, the director offsets in mA
+    tare = [
+        header[f"tare_pressure_{i}"] for i in range(len(header)) if f"tare_pressure_{i}" in header
+    ]
+    tare = header.get("channel offsets", tare)
+    _, _, setpoint, _, _ = _stats(header.get("temperature setpoint", np.nan))
+    _, _, t_min, t_max, t_mean = _stats(record.temperature)
+    run = dict(
+        size=stat.st_size,
+        mtime=stat.st_mtime,
+        start=start,
+        end=end,
+        rows=len(record),
+        version=str(header.get("gas-uptake version", "")),
+        setpoint=setpoint,
+        temperature_min=t_min,
+        temperature_max=t_max,
+        temperature_mean=t_mean,
+        tare=json.dumps(tare, default=_jsonable),
+        header=json.dumps(header, default=_jsonable),
+    )
+    channels = []
+    for name, values in zip(record.pressure_columns, record.pressure.T):
+        initial, final, low, high, mean = _stats(values)
+        uptake = None if initial is None else initial - final
+        channels.append(
+            dict(
+                column=name,
+                initial=initial,
+                final=final,
+                min=low,
+                max=high,
+                mean=mean,
+                uptake=uptake,
+            )
+        )
+    return run, channels
+
+
+class Catalog:
+    """Index of record files.
+
+    Parameters
+    ----------
+    path : path-like
+        SQLite database, created if needed. A directory means ``CATALOG_NAME``
+        inside it.
+    """
+
+    def __init__(self, path):
+        path = pathlib.Path(path)
+        if path.is_dir():
+            path = path / CATALOG_NAME
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("pragma foreign_keys = on")
+        version = self._connection.execute("pragma user_version").fetchone()[0]
+        if version != _schema_version:
+            # the catalog only holds derived data, rebuild it on schema change
+            with self._connection:
+                self._connection.execute("drop table if exists channels")
+                self._connection.execute("drop table if exists runs")
+                self._connection.executescript(_schema)
+                self._connection.execute(f"pragma user_version = {_schema_version}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def add(self, path):
+        """Index one record file, replacing any previous entry."""
+        path = pathlib.Path(path).absolute()
+        run, channels = _summarize(path)
+        with self._connection:
+            self._connection.execute("delete from runs where path = ?", (str(path),))
+            self._connection.execute(
+                f"insert into runs (path, {', '.join(run)}) values (?{', ?' * len(run)})",
+                (str(path), *run.values()),
+            )
+            for channel in channels:
+                self._connection.execute(
+                    f"insert into channels (path, {', '.join(channel)})"
+                    f" values (?{', ?' * len(channel)})",
+                    (str(path), *channel.values()),
+                )
+
+    def update(self, directory, on_error=None):
+        """Index new and changed records in a directory, forget deleted ones.
+
+        Parameters
+        ----------
+        directory : path-like
+            Data directory.
+        on_error : callable, optional
+            Called with the path and exception of records that could not be read.
+            By default they are skipped silently, and retried on the next update.
+
+        Returns
+        -------
+        int
+            Number of records (re)indexed.
+        """
+        directory = pathlib.Path(directory).absolute()
+        known = {
+            row["path"]: (row["size"], row["mtime"])
+            for row in self._connection.execute("select path, size, mtime from runs")
+        }
+        found = set()
+        count = 0
+        for pattern in _patterns:
+            for path in directory.glob(pattern):
+                found.add(str(path))
+                stat = path.stat()
+                if known.get(str(path)) == (stat.st_size, stat.st_mtime):
+                    continue
+                try:
+                    self.add(path)
+                except Exception as e:
+                    if on_error is not None:
+                        on_error(path, e)
+                else:
+                    count += 1
+        gone = [p for p in known if pathlib.Path(p).parent == directory and p not in found]
+        with self._connection:
+            self._connection.executemany("delete from runs where path = ?", [(p,) for p in gone])
+        return count
+
+    def search(
+        self,
+        since=None,
+        until=None,
+        version=None,
+        min_rows=None,
+        min_temperature=None,
+        max_temperature=None,
+        name=None,
+    ):
+        """Runs matching all given filters, oldest first.
+
+        Parameters
+        ----------
+        since, until : datetime.datetime, optional
+            Runs that overlap this time range.
+        version : str, optional
+            gas-uptake version that wrote the record.
+        min_rows : int, optional
+            Fewest rows.
+        min_temperature, max_temperature : float, optional
+            Range the mean temperature must fall in, C.
+        name : str, optional
+            Substring of the file name.
+
+        Returns
+        -------
+        list of dict
+            Columns of ``runs``, with ``header`` and ``tare`` decoded.
+        """
+        clauses, parameters = [], []
+        if since is not None:
+            clauses.append("end >= ?")
+            parameters.append(since.timestamp())
+        if until is not None:
+            clauses.append("start <= ?")
+            parameters.append(until.timestamp())
+        if version is not None:
+            clauses.append("version = ?")
+            parameters.append(version)
+        if min_rows is not None:
+            clauses.append("rows >= ?")
+            parameters.append(min_rows)
+        if min_temperature is not None:
+            clauses.append("temperature_mean >= ?")
+            parameters.append(min_temperature)
+        if max_temperature is not None:
+            clauses.append("temperature_mean <= ?")
+            parameters.append(max_temperature)
+        if name is not None:
+            clauses.append("instr(path, ?) > 0")
+            parameters.append(name)
+        where = " where " + " and ".join(clauses) if clauses else ""
+        runs = []
+        for row in self._connection.execute(
+            f"select * from runs{where} order by start", parameters
+        ):
+            run = dict(row)
+            run["header"] = json.loads(run["header"])
+            run["tare"] = json.loads(run["tare"])
+            runs.append(run)
+        return runs
+
+    def channels(self, path):
+        """Per channel statistics of one run, in column order.
+
+        ``uptake`` is the first minus the last pressure, PSI.
+        """
+        rows = self._connection.execute(
+            "select * from channels where path = ? order by length(column), column",
+            (str(pathlib.Path(path).absolute()),),
+        )
+        return [dict(row) for row in rows]
+
+
+def add_to_catalog(path):
+    """Index one record in the catalog of the directory it is in."""
+    path = pathlib.Path(path).absolute()
+    with Catalog(path.parent) as catalog:
+        catalog.add(path)
@@ -0,0 +1,186 @@
+"""yaqc clients that survive daemon restarts, shared by the director and the GUI."""
+
+
+__all__ = ["Unavailable", "ManagedClient", "start_measuring"]
+
+
+import struct
+import threading
+import time
+
+
+# errors that leave the socket in an unknown state; anything else, like an error
+# returned by the daemon, is a complete round trip and keeps the connection
+_connection_errors = (OSError, EOFError, struct.error)
+
+
+class Unavailable(ConnectionError):
+    """The daemon is disconnected and the next reconnect attempt is not due yet."""
+
+
+def start_measuring(client):
+    """``on_connect`` for sensor daemons: restarted daemons forget their measure loop."""
+    client.measure(loop=True)
+
+
+class ManagedClient:
+    """A yaqc client that reconnects by itself and keeps track of its health.
+
+    The connection is opened on first use, not at construction, so a daemon that
+    is down when the program starts only costs NaN readings. Every call goes
+    through ``call`` (or attribute access, ``client.get_measured()``). A call that
+    fails at the connection level (refused, reset, timed out) drops the
+    connection; the next attempt to reconnect is delayed by
+    ``backoff``, doubling with each consecutive failure up to ``max_backoff``.
+    While waiting, calls raise ``Unavailable`` at once without touching the
+    network, so a dead device never stalls the caller.
+
+    ``on_connect`` runs after every new connection, including the silent
+    reconnects yaqc makes itself when it finds a broken socket. Use it to restore
+    daemon state that does not survive a restart, e.g. ``measure(loop=True)``.
+
+    Calls are serialized, one at a time per client.
+
+    Parameters
+    ----------
+    host : str
+        Daemon host.
+    port : int
+        Daemon port.
+    name : str, optional
+        Name used in messages. Defaults to ``host:port``.
+    on_connect : callable, optional
+        Called with the yaqc client after each (re)connection.
+    timeout : float
+        Socket timeout, seconds. Default 10.
+    backoff : float
+        First reconnect delay, seconds. Default 0.5.
+    max_backoff : float
+        Longest reconnect delay, seconds. Default 30.
+    logger : logging.Logger, optional
+        Disconnects and reconnects are logged here, once per transition.
+    """
+
+    def __init__(
+        self,
+        host,
+        port,
+        name=None,
+        on_connect=None,
+        timeout=10.0,
+        backoff=0.5,
+        max_backoff=30.0,
+        logger=None,
+    ):
+        self.host = host
+        self.port = port
+        self.name = name if name is not None else f"{host}:{port}"
+        self.on_connect = on_connect
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.logger = logger
+        self._client = None
+        self._reconnected = False
+        self._lock = threading.RLock()
+        self._next_attempt = 0.0
+        self.consecutive_failures = 0
+        self.failures = 0
+        self.reconnects = 0
+        self.last_error = ""
+        self.last_success = None
+
+    def __repr__(self):
+        state = "connected" if self.connected else "disconnected"
+        return f"<ManagedClient {self.name} to {self.host}:{self.port}, {state}>"
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    @property
+    def connected(self):
+        return self._client is not None
+
+    def has_message(self, name):
+        """True if the daemon implements message ``name``. Connects if needed."""
+        with self._lock:
+            return name in self._connect()._protocol["messages"]
+
+    def call(self, method, *args, **kwargs):
+        """Send a message to the daemon, connecting first if needed."""
+        with self._lock:
+            client = self._connect()
+            try:
+                result = getattr(client, method)(*args, **kwargs)
+                if self._reconnected:
+                    # yaqc reconnected under the hood, the daemon may have restarted
+                    self._reconnected = False
+                    self.reconnects += 1
+                    self._log("info", f"{self.name} reconnected")
+                    if self.on_connect is not None:
+                        self.on_connect(client)
+            except _connection_errors as e:
+                self._fail(e)
+                raise
+            self._succeed()
+            return result
+
+    def health(self):
+        """Connection state and failure counts."""
+        since = None if self.last_success is None else time.monotonic() - self.last_success
+        return {
+            "connected": self.connected,
+            "consecutive_failures": self.consecutive_failures,
+            "failures": self.failures,
+            "reconnects": self.reconnects,
+            "seconds_since_success": since,
+            "last_error": self.last_error,
+        }
+
+    def _connect(self):
+        if self._client is not None:
+            return self._client
+        now = time.monotonic()
+        if now < self._next_attempt:
+            raise Unavailable(
+                f"{self.name} unavailable, next attempt in {self._next_attempt - now:.1f} s"
+            )
+        import yaqc
+
+        try:
+            client = yaqc.Client(self.port, host=self.host, timeout=self.timeout)
+            if self.on_connect is not None:
+                self.on_connect(client)
+        except Exception as e:
+            self._fail(e)
+            raise
+        client.register_connection_callback(self._on_handshake)
+        if self.last_success is not None:
+            self.reconnects += 1
+            self._log("info", f"{self.name} reconnected")
+        self._client = client
+        return client
+
+    def _on_handshake(self):
+        # called by yaqc while it holds its own lock, so no messages may be sent here
+        self._reconnected = True
+
+    def _fail(self, error):
+        if self.consecutive_failures == 0:
+            self._log("warning", f"{self.name} failed: {error!r}")
+        self._client = None
+        self.consecutive_failures += 1
+        self.failures += 1
+        self.last_error = repr(error)
+        delay = min(self.backoff * 2 ** (self.consecutive_failures - 1), self.max_backoff)
+        self._next_attempt = time.monotonic() + delay
+
+    def _succeed(self):
+        self.consecutive_failures = 0
+        self.last_success = time.monotonic()
+
+    def _log(self, level, message):
+        if self.logger is not None:
+            getattr(self.logger, level)(message)
@@ -0,0 +1,397 @@
+"""Load gas uptake record files and reduce them to uptake, rates and yields.
+
+Text records are a ``key:<tab>value`` header, a ``column:`` line and tab separated
+rows. The header is parsed in python, the body in a single numpy call. HDF5
+records are read column by column. Loaded data can be cached as ``.npy`` next to
+the record and memory-mapped on later loads. Records still being written can be
+followed with ``RecordTail``, which only parses what was appended.
+
+The analysis functions are vectorized over reactors: pressure arrays have one
+column per transducer and every reactor is processed at once.
+"""
+
+
+__all__ = [
+    "GAS_CONSTANT",
+    "Record",
+    "read_header",
+    "load",
+    "RecordTail",
+    "moles_consumed",
+    "initial_rate",
+    "normalize",
+]
+
+
+import ast
+import os
+import pathlib
+import re
+import time
+
+import numpy as np
+
+
+GAS_CONSTANT = 8.314462618  # J / (mol K)
+PSI = 6894.757293168  # Pa
+
+
+class Record:
+    """Data and metadata of one record file.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        Record file.
+    header : dict
+        Header items.
+    columns : list of str
+        Column names.
+    data : numpy.ndarray
+        Array of shape (rows, columns). May be a read-only memory map.
+    """
+
+    def __init__(self, path, header, columns, data):
+        self.path = path
+        self.header = header
+        self.columns = list(columns)
+        self.data = data
+
+    def __repr__(self):
+        return f"<Record {self.path.name}, {len(self)} rows, {len(self.columns)} columns>"
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __getitem__(self, column):
+        return self.data[:, self.columns.index(column)]
+
+    @property
+    def table(self):
+        """Structured array view of the data, one float64 field per column."""
+        dtype = np.dtype([(c, "f8") for c in self.columns])
+        return np.ascontiguousarray(self.data).view(dtype).reshape(-1)
+
+    @property
+    def time(self):
+        """Seconds since the first row."""
+        labtime = self["labtime"]
+        return labtime - labtime[0] if len(labtime) else labtime
+
+    @property
+    def temperature(self):
+        """Temperature, C. Shape (rows,) for one zone, (rows, zones) for several."""
+        if "temperature" in self.columns:
+            return self["temperature"]
+        return self.data[:, self._indices(r"temperature_\w+")]
+
+    @property
+    def pressure_columns(self):
+        """Names of the pressure columns, ``pressure_<i>``, without noise or rates."""
+        return [self.columns[i] for i in self._indices(r"pressure_\d+")]
+
+    @property
+    def pressure(self):
+        """Pressure, PSI, shape (rows, transducers)."""
+        return self.data[:, self._indices(r"pressure_\d+")]
+
+    def _indices(self, pattern):
+        return [i for i, c in enumerate(self.columns) if re.fullmatch(pattern, c)]
+
+
+def read_header(path):
+    """Read the header of a text record.
+
+    Returns
+    -------
+    header : dict
+        Header items. Values are parsed as python literals where possible.
+    columns : list of str
+        Column names.
+    offset : int
+        Byte offset of the first row.
+    """
+    header = dict()
+    with open(path, "rb") as f:
+        for line in f:
+            key, _, value = line.decode().rstrip("\r\n").partition("\t")
+            key = key.rstrip(":")
+            if key == "column":
+                columns = [ast.literal_eval(c) for c in value.strip("[]").split("\t")]
+                return header, columns, f.tell()
+            try:
+                header[key] = ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                header[key] = value
+    raise ValueError(f"{path} has no column line")
+
+
+def _read_text(path):
+    header, columns, offset = read_header(path)
+    with open(path, "rb") as f:
+        f.seek(offset)
+        body = f.read()
+    # a record being written, or cut short by a crash, may end in a partial row,
+    # possibly mid-number or padded with NUL; only complete lines are parsed
+    body = body[: body.rfind(b"\n") + 1]
+    # one C level parse of the whole body, much faster than fromfile or loadtxt
+    data = np.fromstring(body, sep=" ")
+    data = data[: data.size - data.size % len(columns)]
+    return header, columns, data.reshape(-1, len(columns))
+
+
+def _read_hdf5(path):
+    try:
+        import h5py  # type: ignore
+    except ImportError as e:
+        raise ImportError("h5py is required to read HDF5 records") from e
+    with h5py.File(path, "r") as f:
+        header = {k: v for k, v in f.attrs.items() if k != "columns"}
+        columns = [str(c) for c in f.attrs["columns"]]
+        data = np.empty((f[columns[0]].shape[0], len(columns)))
+        for i, column in enumerate(columns):
+            f[column].read_direct(data, dest_sel=np.s_[:, i])
+    return header, columns, data
+
+
+def load(path, cache=False):
+    """Load a record file.
+
+    Parameters
+    ----------
+    path : path-like
+        Text (``.txt``) or HDF5 (``.h5``) record.
+    cache : bool
+        Keep a copy of the data as ``<path>.npy``. When that copy is newer than
+        the record it is memory-mapped instead of parsing the record again.
+        Default False.
+
+    Returns
+    -------
+    Record
+    """
+    path = pathlib.Path(path)
+    npy = path.with_name(path.name + ".npy")
+    if path.suffix == ".h5":
+        header, columns, data = _read_hdf5(path)
+        return Record(path, header, columns, data)
+    if cache and npy.exists() and npy.stat().st_mtime >= path.stat().st_mtime:
+        header, columns, _ = read_header(path)
+        return Record(path, header, columns, np.load(npy, mmap_mode="r"))
+    header, columns, data = _read_text(path)
+    if cache:
+        np.save(npy, data)
+    return Record(path, header, columns, data)
+
+
+class RecordTail:
+    """Follow a text record while it is being written.
+
+    Remembers how far into the file it has read and only parses what was
+    appended since, so each update costs time proportional to the new rows. A
+    trailing partial row is left for the next read. If the file shrinks or is
+    replaced, reading starts over from the header.
+
+    Parameters
+    ----------
+    path : path-like
+        Text record. Need not exist yet.
+    poll_interval : float
+        Seconds between checks for new data in ``follow``. Checking is a single
+        ``os.stat``. Default 1.
+
+    Attributes
+    ----------
+    header : dict or None
+        Header items, None until the column line has been written.
+    columns : list of str or None
+        Column names, None until the column line has been written.
+    rows : int
+        Number of rows read so far.
+    """
+
+    def __init__(self, path, poll_interval=1.0):
+        self.path = pathlib.Path(path)
+        self.poll_interval = poll_interval
+        self.header = None
+        self.columns = None
+        self.rows = 0
+        self._offset = 0
+        self._inode = None
+
+    def _reset(self):
+        self.header = None
+        self.columns = None
+        self.rows = 0
+        self._offset = 0
+
+    def _stat(self):
+        try:
+            return os.stat(self.path)
+        except FileNotFoundError:
+            return None
+
+    def pending(self):
+        """True if the file has grown, shrunk or been replaced since the last read."""
+        stat = self._stat()
+        if stat is None:
+            return False
+        return stat.st_ino != self._inode or stat.st_size != self._offset
+
+    def read(self):
+        """Rows appended since the last call.
+
+        Returns
+        -------
+        numpy.ndarray
+            Shape (new rows, columns). Zero rows if nothing complete was appended
+            or the header is not complete yet.
+        """
+        stat = self._stat()
+        if stat is None:
+            return np.empty((0, 0 if self.columns is None else len(self.columns)))
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self._reset()
+            self._inode = stat.st_ino
+        if self.columns is None:
+            try:
+                self.header, self.columns, self._offset = read_header(self.path)
+            except ValueError:
+                return np.empty((0, 0))  # header not complete yet
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read()
+        end = chunk.rfind(b"\n") + 1
+        self._offset += end
+        data = np.fromstring(chunk[:end], sep=" ")
+        data = data[: data.size - data.size % len(self.columns)].reshape(-1, len(self.columns))
+        self.rows += data.shape[0]
+        return data
+
+    def follow(self, timeout=None):
+        """Yield new rows as they are appended.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Stop after this many seconds without new rows. By default follow
+            forever.
+
+        Yields
+        ------
+        numpy.ndarray
+            Shape (new rows, columns), never empty.
+        """
+        last = time.monotonic()
+        while True:
+            if self.pending():
+                data = self.read()
+                if data.shape[0]:
+                    last = time.monotonic()
+                    yield data
+                    continue
+            if timeout is not None and time.monotonic() - last > timeout:
+                return
+            time.sleep(self.poll_interval)
+
+
+def moles_consumed(pressure, temperature, volume, initial=0):
+    """Moles of gas taken up, from the drop in headspace pressure.
+
+    Ideal gas, constant headspace volume. With the temperature at each row
+    the result follows ``n0 - n = V / R * (P0 / T0 - P / T)``.
+
+    Parameters
+    ----------
+    pressure : array_like
+        Absolute pressure, PSI, shape (rows,) or (rows, reactors).
+    temperature : array_like
+        Temperature, C. Broadcast against ``pressure``.
+    volume : float or array_like
+        Headspace volume, mL, scalar or one per reactor.
+    initial : int
+        Row of the initial state. Default 0.
+
+    Returns
+    -------
+    numpy.ndarray
+        Moles consumed, same shape as ``pressure``.
+    """
+    pressure = np.asarray(pressure, dtype=float) * PSI
+    temperature = np.asarray(temperature, dtype=float) + 273.15
+    if pressure.ndim == 2 and temperature.ndim == 1:
+        temperature = temperature[:, None]
+    temperature = np.broadcast_to(temperature, pressure.shape)
+    volume = np.asarray(volume, dtype=float) * 1e-6  # m^3
+    ratio = pressure / temperature
+    return volume / GAS_CONSTANT * (ratio[initial] - ratio)
+
+
+def initial_rate(time, values, window, start=0.0):
+    """Initial rate of change, by a least squares line over the start of a run.
+
+    NaN rows are skipped per column.
+
+    Parameters
+    ----------
+    time : array_like
+        Seconds, shape (rows,).
+    values : array_like
+        Shape (rows,) or (rows, reactors).
+    window : float
+        Length of the fitted interval, seconds.
+    start : float
+        Beginning of the fitted interval, seconds. Default 0.
+
+    Returns
+    -------
+    slope : numpy.ndarray or float
+        Units of ``values`` per second, one per reactor. NaN with fewer than two
+        points.
+    intercept : numpy.ndarray or float
+        Fitted value at ``start``.
+    """
+    time = np.asarray(time, dtype=float)
+    values = np.asarray(values, dtype=float)
+    selected = (time >= start) & (time <= start + window)
+    t = time[selected] - start
+    y = values[selected]
+    if y.ndim == 2:
+        t = np.broadcast_to(t[:, None], y.shape)
+    valid = ~np.isnan(y)
+    t = np.where(valid, t, 0.0)
+    y = np.where(valid, y, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        n = valid.sum(axis=0)
+        mean_t = t.sum(axis=0) / n
+        mean_y = y.sum(axis=0) / n
+        dt = np.where(valid, t - mean_t, 0.0)
+        dy = np.where(valid, y - mean_y, 0.0)
+        slope = (dt * dy).sum(axis=0) / (dt * dt).sum(axis=0)
+        intercept = mean_y - slope * mean_t
+    slope = np.where(n > 1, slope, np.nan)
+    intercept = np.where(n > 1, intercept, np.nan)
+    return slope[()], intercept[()]
+
+
+def normalize(values, amount):
+    """Divide each reactor's values by its loading.
+
+    Parameters
+    ----------
+    values : array_like
+        Shape (rows, reactors) or (reactors,).
+    amount : array_like
+        One loading per reactor, e.g. mmol of substrate or g of catalyst.
+        Reactors with zero or NaN loading come out NaN.
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    values = np.asarray(values, dtype=float)
+    amount = np.asarray(amount, dtype=float)
+    if amount.shape != values.shape[-1:]:
+        raise ValueError(f"{amount.size} loadings for {values.shape[-1]} reactors")
+    amount = np.where(amount == 0, np.nan, amount)
+    return values / amount
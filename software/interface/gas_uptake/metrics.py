@@ -0,0 +1,156 @@
+"""Timing histograms and counters for the acquisition path."""
+
+
+__all__ = ["Histogram", "Metrics"]
+
+
+import bisect
+import contextlib
+import json
+import math
+import threading
+import time
+
+
+class Histogram:
+    """Distribution of durations in logarithmic bins.
+
+    Bins are fixed, ``per_decade`` per factor of ten between ``low`` and ``high``
+    seconds, so recording is O(log bins) and memory does not grow with the number of
+    samples. Values outside the range land in the first or last bin. Percentiles are
+    therefore accurate to within one bin width (about 26% with the default 10 per decade);
+    count, mean, minimum and maximum are exact.
+
+    Parameters
+    ----------
+    low : float
+        Upper edge of the first bin, seconds.
+    high : float
+        Lower edge of the last bin, seconds.
+    per_decade : int
+        Bins per factor of ten.
+    """
+
+    def __init__(self, low=1e-6, high=1e3, per_decade=10):
+        decades = math.log10(high / low)
+        n = int(round(decades * per_decade))
+        self.edges = [low * 10 ** (i / per_decade) for i in range(n + 1)]
+        self.clear()
+
+    def clear(self):
+        self.counts = [0] * (len(self.edges) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def record(self, value):
+        self.counts[bisect.bisect_left(self.edges, value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """Estimate of the ``q`` quantile, 0 <= q <= 1.
+
+        Interpolated geometrically within the bin that holds it, and clipped to the
+        recorded minimum and maximum.
+        """
+        if not self.count:
+            return math.nan
+        target = q * self.count
+        cumulative = 0
+        for i, c in enumerate(self.counts):
+            if c and cumulative + c >= target:
+                lower = self.edges[i - 1] if i > 0 else self.min
+                upper = self.edges[i] if i < len(self.edges) else self.max
+                lower = min(max(lower, self.min), self.max)
+                upper = min(max(upper, self.min), self.max)
+                fraction = (target - cumulative) / c
+                if lower <= 0:
+                    return lower + (upper - lower) * fraction
+                return lower * (upper / lower) ** fraction
+            cumulative += c
+        return self.max
+
+    def summary(self):
+        """Count, mean, min, max and 50th, 90th and 99th percentiles, in seconds."""
+        if not self.count:
+            nan = math.nan
+            return {
+                "count": 0.0,
+                "mean": nan,
+                "min": nan,
+                "max": nan,
+                "p50": nan,
+                "p90": nan,
+                "p99": nan,
+            }
+        return {
+            "count": float(self.count),
+            "mean": self.total / self.count,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+        }
+
+
+class Metrics:
+    """Named timing histograms and event counters, safe to share between threads.
+
+    Examples
+    --------
+    >>> metrics = Metrics()
+    >>> with metrics.time("convert"):
+    ...     convert()
+    >>> metrics.increment("poll_missed")
+    >>> metrics.summary()["convert"]["p99"]
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = dict()
+        self.counters = dict()
+
+    def record(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.record(seconds)
+
+    @contextlib.contextmanager
+    def time(self, name):
+        """Record the wall time of the ``with`` block under ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def increment(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def summary(self):
+        """Histogram summaries by name, and counters as ``{"count": n}``."""
+        with self._lock:
+            out = {name: h.summary() for name, h in self.histograms.items()}
+            out.update({name: {"count": float(n)} for name, n in self.counters.items()})
+        return out
+
+    def dump(self, path):
+        """Append the current summary to ``path`` as one JSON line, with a timestamp."""
+        line = json.dumps({"time": time.time(), "metrics": self.summary()})
+        with open(path, "a") as f:
+            f.write(line + "\n")
@@ -0,0 +1,208 @@
+"""Streaming uptake rate and endpoint estimators, updated once per row.
+
+Every estimator handles all channels at once and costs O(1) per row regardless
+of window length or run duration. NaN readings are skipped per channel.
+"""
+
+
+__all__ = ["SlidingRate", "EWMA", "PlateauDetector", "UptakeMonitor"]
+
+
+import numpy as np
+
+
+class SlidingRate:
+    """Least squares slope over the last ``window`` rows, per channel.
+
+    Keeps running sums of t, y, t² and ty that are updated as rows enter and
+    leave the window. Times are taken relative to a reference that moves with the
+    window; the sums are recomputed from the window once per ``window`` rows so
+    rounding error cannot build up over a long run.
+
+    Parameters
+    ----------
+    channels : int
+        Number of channels.
+    window : int
+        Number of rows in the fit.
+    """
+
+    def __init__(self, channels, window):
+        if window < 2:
+            raise ValueError(f"window must be at least 2, not {window}")
+        self.channels = channels
+        self.window = window
+        self._t = np.full(window, np.nan)
+        self._y = np.full((window, channels), np.nan)
+        self.clear()
+
+    def clear(self):
+        self._t[:] = np.nan
+        self._y[:] = np.nan
+        self.count = 0
+        self._t0 = None
+        self._sums = np.zeros((5, self.channels))  # n, t, y, tt, ty
+
+    def _add(self, t, y, sign):
+        valid = ~np.isnan(y)
+        t = t - self._t0
+        y = np.where(valid, y, 0.0)
+        terms = np.array([np.ones_like(y), np.full_like(y, t), y, np.full_like(y, t * t), t * y])
+        self._sums += sign * valid * terms
+
+    def _recompute(self):
+        self._t0 = np.nanmin(self._t)
+        self._sums[:] = 0
+        for t, y in zip(self._t, self._y):
+            if not np.isnan(t):
+                self._add(t, y, 1)
+
+    def append(self, t, y):
+        """Add one row: time in seconds and one reading per channel."""
+        i = self.count % self.window
+        if self._t0 is None:
+            self._t0 = t
+        if self.count >= self.window:
+            self._add(self._t[i], self._y[i], -1)
+        self._t[i] = t
+        self._y[i] = y
+        self._add(t, np.asarray(y, dtype=float), 1)
+        self.count += 1
+        if self.count % self.window == 0:
+            self._recompute()
+
+    @property
+    def value(self):
+        """Slope per channel, units of y per second. NaN with fewer than two points."""
+        n, st, sy, stt, sty = self._sums
+        with np.errstate(invalid="ignore", divide="ignore"):
+            denominator = n * stt - st * st
+            slope = (n * sty - st * sy) / denominator
+        return np.where((n > 1) & (denominator > 0), slope, np.nan)
+
+
+class EWMA:
+    """Exponentially weighted moving average, per channel.
+
+    Parameters
+    ----------
+    channels : int
+        Number of channels.
+    alpha : float
+        Weight of each new value, 0 to 1.
+    """
+
+    def __init__(self, channels, alpha):
+        if not 0 < alpha <= 1:
+            raise ValueError(f"alpha must be in (0, 1], not {alpha}")
+        self.alpha = alpha
+        self.value = np.full(channels, np.nan)
+
+    def clear(self):
+        self.value[:] = np.nan
+
+    def append(self, x):
+        x = np.asarray(x, dtype=float)
+        updated = self.value + self.alpha * (x - self.value)
+        self.value = np.where(np.isnan(self.value), x, np.where(np.isnan(x), self.value, updated))
+
+
+class PlateauDetector:
+    """Flag channels whose rate has stayed near zero for a while.
+
+    Parameters
+    ----------
+    channels : int
+        Number of channels.
+    threshold : float
+        Largest absolute rate considered flat.
+    hold : float
+        Seconds the rate must stay flat before the channel counts as finished.
+    """
+
+    def __init__(self, channels, threshold, hold):
+        self.threshold = threshold
+        self.hold = hold
+        self.since = np.full(channels, np.nan)
+        self.time = np.nan
+
+    def clear(self):
+        self.since[:] = np.nan
+        self.time = np.nan
+
+    def append(self, t, rate):
+        flat = np.abs(rate) <= self.threshold  # False for NaN
+        self.since = np.where(flat, np.where(np.isnan(self.since), t, self.since), np.nan)
+        self.time = t
+
+    @property
+    def duration(self):
+        """Seconds each channel has been flat, 0 if it is not."""
+        return np.nan_to_num(self.time - self.since, nan=0.0)
+
+    @property
+    def finished(self):
+        return self.duration >= self.hold
+
+
+class UptakeMonitor:
+    """Rate and endpoint of every reactor, from a stream of pressure rows.
+
+    Parameters
+    ----------
+    channels : int
+        Number of transducers.
+    window : int
+        Rows in the sliding rate fit. Default 120.
+    alpha : float
+        EWMA weight of each new rate. Default 0.1.
+    plateau_rate : float
+        Largest smoothed rate, in PSI/s, counted as flat. Default 1e-4.
+    plateau_time : float
+        Seconds the smoothed rate must stay flat to call the reaction finished.
+        Default 600.
+
+    Attributes
+    ----------
+    rate : numpy.ndarray
+        Sliding window dP/dt, PSI/s.
+    smoothed_rate : numpy.ndarray
+        EWMA of ``rate``, PSI/s.
+    plateau_time : numpy.ndarray
+        Seconds the smoothed rate has been flat.
+    finished : numpy.ndarray of bool
+        Endpoint reached.
+    """
+
+    def __init__(self, channels, window=120, alpha=0.1, plateau_rate=1e-4, plateau_time=600.0):
+        self.channels = channels
+        self._rate = SlidingRate(channels, window)
+        self._smoothed = EWMA(channels, alpha)
+        self._plateau = PlateauDetector(channels, plateau_rate, plateau_time)
+
+    def clear(self):
+        self._rate.clear()
+        self._smoothed.clear()
+        self._plateau.clear()
+
+    def append(self, t, pressure):
+        """Add one row: time in seconds and pressure per transducer."""
+        self._rate.append(t, pressure)
+        self._smoothed.append(self._rate.value)
+        self._plateau.append(t, self._smoothed.value)
+
+    @property
+    def rate(self):
+        return self._rate.value
+
+    @property
+    def smoothed_rate(self):
+        return self._smoothed.value
+
+    @property
+    def plateau_time(self):
+        return self._plateau.duration
+
+    @property
+    def finished(self):
+        return self._plateau.finished
@@ -0,0 +1,513 @@
+"""Writers for gas uptake record files, shared by the director and the GUI."""
+
+
+__all__ = [
+    "formats",
+    "open_record_writer",
+    "DeadbandFilter",
+    "RunJournal",
+    "TextRecordWriter",
+    "HDF5RecordWriter",
+    "read_text_record",
+    "convert_text_to_hdf5",
+]
+
+
+import datetime
+import json
+import math
+import os
+import pathlib
+import tempfile
+import threading
+import time
+
+
+class _RecordWriter:
+    """Buffer rows in memory and write them from a background thread.
+
+    The file stays open for the life of the writer. ``write`` only appends the row
+    to an in-memory buffer; a background thread writes buffered rows once
+    ``flush_rows`` have accumulated or ``flush_interval`` seconds have passed,
+    whichever comes first. Every flush is followed by ``os.fsync``, so a crash
+    loses at most ``flush_interval`` seconds of data.
+
+    Subclasses implement ``_open``, ``_write_header``, ``_write_rows``, ``_sync``
+    and ``_close`` for their file format.
+
+    Parameters
+    ----------
+    path : path-like
+        Record file. Created if it does not exist, appended to otherwise.
+    header : dict
+        Metadata stored with the data. Pass None to append to an existing record.
+    columns : list of str
+        Column names.
+    flush_rows : int
+        Number of buffered rows that triggers a flush.
+    flush_interval : float
+        Maximum time rows may sit in memory, in seconds.
+    metrics : gas_uptake.metrics.Metrics, optional
+        Records the time taken by each write and sync as ``flush``.
+    """
+
+    def __init__(self, path, header, columns, flush_rows=60, flush_interval=5.0, metrics=None):
+        self.path = path
+        self.columns = list(columns)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.metrics = metrics
+        self._buffer = []
+        self._error = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._open()
+        if header is not None:
+            self._write_header(header)
+            self._sync()
+        self._thread = threading.Thread(target=self._run, name="record-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, row):
+        """Queue one row for writing. Does not block on disk."""
+        if self._error is not None:
+            raise self._error
+        with self._condition:
+            if self._closed:
+                raise ValueError("write to closed record writer")
+            self._buffer.append(row)
+            if len(self._buffer) >= self.flush_rows:
+                self._condition.notify()
+
+    def write_rows(self, rows):
+        """Queue many rows for writing. Does not block on disk."""
+        if self._error is not None:
+            raise self._error
+        with self._condition:
+            if self._closed:
+                raise ValueError("write to closed record writer")
+            self._buffer.extend(rows)
+            if len(self._buffer) >= self.flush_rows:
+                self._condition.notify()
+
+    def flush(self):
+        """Write and fsync everything buffered so far. Blocks until done."""
+        self._flush()
+
+    def close(self):
+        """Flush remaining rows, stop the background thread and close the file."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self._close()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        closed = False
+        while not closed:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._closed and len(self._buffer) < self.flush_rows:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                closed = self._closed
+            self._flush()
+
+    def _flush(self):
+        # disk access happens outside of self._condition so write never waits on it
+        # self._io_lock keeps batches in order when flush is called from outside
+        with self._io_lock:
+            with self._condition:
+                rows, self._buffer = self._buffer, []
+            if not rows or self._error is not None:
+                return
+            start = time.perf_counter()
+            try:
+                self._write_rows(rows)
+                self._sync()
+            except Exception as e:
+                self._error = e
+            if self.metrics is not None:
+                self.metrics.record("flush", time.perf_counter() - start)
+
+
+class TextRecordWriter(_RecordWriter):
+    """Tab-separated text record, one ``key:<tab>value`` line per header item."""
+
+    suffix = ".txt"
+
+    def _open(self):
+        self._format = "%8.6f\t" * len(self.columns) + "\n"
+        self._file = open(self.path, "a")
+
+    def _write_header(self, header):
+        tab = "\t"
+        newline = "\n"
+        for k, v in header.items():
+            self._file.write(f"{k}:" + tab + repr(v) + newline)
+        self._file.write("column:" + tab + "[")
+        self._file.write(tab.join(repr(c) for c in self.columns))
+        self._file.write("]" + newline)
+
+    def _write_rows(self, rows):
+        self._file.write("".join(self._format % tuple(row) for row in rows))
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _close(self):
+        self._file.close()
+
+
+class HDF5RecordWriter(_RecordWriter):
+    """HDF5 record, one chunked, gzip compressed float64 dataset per column.
+
+    Header items are stored as attributes of the file root. Requires h5py.
+    """
+
+    suffix = ".h5"
+    chunk_rows = 4096
+
+    def _open(self):
+        try:
+            import h5py  # type: ignore
+        except ImportError as e:
+            raise ImportError("h5py is required to write HDF5 records") from e
+        import numpy as np
+
+        self._np = np
+        self._file = h5py.File(self.path, "a")
+        for column in self.columns:
+            if column not in self._file:
+                self._file.create_dataset(
+                    column,
+                    shape=(0,),
+                    maxshape=(None,),
+                    dtype="f8",
+                    chunks=(self.chunk_rows,),
+                    compression="gzip",
+                    shuffle=True,
+                )
+
+    def _write_header(self, header):
+        for k, v in header.items():
+            self._file.attrs[k] = v
+        self._file.attrs["columns"] = self.columns
+
+    def _write_rows(self, rows):
+        rows = self._np.asarray(rows, dtype="f8")
+        for i, column in enumerate(self.columns):
+            dataset = self._file[column]
+            start = dataset.shape[0]
+            dataset.resize((start + len(rows),))
+            dataset[start:] = rows[:, i]
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.id.get_vfd_handle())
+
+    def _close(self):
+        self._file.close()
+
+
+formats = {"txt": TextRecordWriter, "h5": HDF5RecordWriter}
+
+
+def open_record_writer(path, header, columns, format="txt", **kwargs):
+    """Open a record writer for the given format.
+
+    Parameters
+    ----------
+    path : path-like
+        Record file, without suffix. The suffix of the chosen format is added.
+    header : dict
+        Metadata stored with the data.
+    columns : list of str
+        Column names.
+    format : {'txt', 'h5'}
+        File format.
+    **kwargs
+        Passed to the writer.
+    """
+    cls = formats[format]
+    path = pathlib.Path(path).with_suffix(cls.suffix)
+    return cls(path, header, columns, **kwargs)
+
+
+class DeadbandFilter:
+    """Choose which rows to record so file size follows information content.
+
+    A row is kept when any column moved by more than its deadband since the last
+    kept row, or when ``max_interval`` seconds have passed. When a change ends a
+    quiet stretch, the last row of that stretch is kept too, so the record shows
+    exactly when the change began. Rows keep their own timestamps.
+
+    Parameters
+    ----------
+    deadbands : array_like
+        One per column. Use ``inf`` for columns that should never trigger a row,
+        such as the time column.
+    max_interval : float
+        Longest time between kept rows, seconds. 0 keeps every row.
+    time_column : int
+        Index of the time column, seconds. Default 0.
+    """
+
+    def __init__(self, deadbands, max_interval, time_column=0):
+        import numpy as np
+
+        self._np = np
+        self.deadbands = np.asarray(deadbands, dtype=float)
+        self.max_interval = max_interval
+        self.time_column = time_column
+        self.reset()
+
+    def reset(self):
+        self.seen = 0
+        self.written = 0
+        self._last = None  # last kept row
+        self._held = None  # last row seen, if it was not kept
+
+    @property
+    def ratio(self):
+        """Rows seen per row kept."""
+        return self.seen / self.written if self.written else float("nan")
+
+    def filter(self, row):
+        """Rows to write for one new row: none, the row, or the last held row and the row."""
+        np = self._np
+        self.seen += 1
+        values = np.asarray(row, dtype=float)
+        changed = True
+        if self._last is not None:
+            last = self._last
+            with np.errstate(invalid="ignore"):
+                moved = np.abs(values - last) > self.deadbands
+            appeared = np.isnan(values) != np.isnan(last)  # a channel dropped out or came back
+            changed = moved.any() or (appeared & np.isfinite(self.deadbands)).any()
+            due = values[self.time_column] - last[self.time_column] >= self.max_interval
+            if not (changed or due):
+                self._held = row
+                return []
+        out = [self._held, row] if changed and self._held is not None else [row]
+        self._held = None
+        self._last = values
+        self.written += len(out)
+        return out
+
+
+def _repair(path):
+    """Cut the end of a record left by a crash, so appended rows line up.
+
+    Text records lose a trailing partial row. HDF5 columns are cut to the
+    shortest, a crash between resizing two datasets leaves them uneven.
+    """
+    if path.suffix == HDF5RecordWriter.suffix:
+        import h5py  # type: ignore
+
+        with h5py.File(path, "a") as f:
+            columns = [str(c) for c in f.attrs["columns"]]
+            rows = min(f[c].shape[0] for c in columns)
+            for column in columns:
+                f[column].resize((rows,))
+        return
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(size - 4096, 0))
+        tail = f.read()
+        if tail.endswith(b"\n") or not tail:
+            return
+        if b"\n" not in tail:
+            raise ValueError(f"{path} does not end in a complete row")
+        f.truncate(size - len(tail) + tail.rfind(b"\n") + 1)
+
+
+class RunJournal:
+    """On-disk note of the run being recorded, so a restarted program can resume it.
+
+    ``begin`` saves the record path, format, columns and header when recording
+    starts, ``note`` keeps live settings such as setpoints up to date, and ``end``
+    deletes the journal when recording stops. A journal still present at startup
+    means the program died mid-run: ``resume`` then reopens the record and
+    appends to it, after a gap marker row of NaN stamped with the time of the
+    restart. If the record cannot be appended to (it is gone or damaged, or the
+    columns changed), a new segment is started whose header names the file it
+    ``continues``. Every save replaces the file atomically.
+
+    Parameters
+    ----------
+    path : path-like
+        Journal file, JSON.
+
+    Attributes
+    ----------
+    entry : dict or None
+        Journal contents: ``path``, ``format``, ``columns``, ``header``,
+        ``segments`` (record files of the run, in order), ``resumes`` (pairs of
+        last write and restart time, seconds since the epoch) and ``state``
+        (items passed to ``note``). None when no run is in progress.
+    """
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self.entry = None
+
+    def begin(self, record_path, header, columns, format="txt", **state):
+        """Note the start of a run."""
+        record_path = pathlib.Path(record_path).absolute()
+        self.entry = {
+            "path": str(record_path),
+            "format": format,
+            "columns": list(columns),
+            "header": header,
+            "segments": [str(record_path)],
+            "resumes": [],
+            "state": state,
+        }
+        self._save()
+
+    def note(self, **state):
+        """Update live settings of the current run. Does nothing between runs."""
+        if self.entry is None:
+            return
+        self.entry["state"].update(state)
+        self._save()
+
+    def end(self):
+        """Forget the current run."""
+        self.entry = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def resume(self, columns, max_gap=0, **kwargs):
+        """Reopen the record of a run interrupted by a crash or restart.
+
+        Parameters
+        ----------
+        columns : list of str
+            Columns the program records now. The first is time, in seconds.
+        max_gap : float
+            Give up on runs whose record was last written more than this many
+            seconds ago; the journal is cleared and None returned. 0 resumes runs
+            of any age. Default 0.
+        **kwargs
+            Passed to the writer.
+
+        Returns
+        -------
+        writer or None
+            Open writer, None if there was no run to resume.
+        """
+        try:
+            with open(self.path) as f:
+                self.entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            self.end()  # not written by _save, which is atomic
+            return None
+        entry = self.entry
+        path = pathlib.Path(entry["path"])
+        now = time.time()
+        try:
+            stopped = path.stat().st_mtime
+        except FileNotFoundError:
+            stopped = None
+        if max_gap and (stopped is None or now - stopped > max_gap):
+            self.end()
+            return None
+        cls = formats[entry["format"]]
+        writer = None
+        if stopped is not None and list(columns) == entry["columns"]:
+            try:
+                _repair(path)
+                writer = cls(path, None, columns, **kwargs)
+            except Exception:
+                writer = None
+            else:
+                writer.write([now] + [math.nan] * (len(columns) - 1))
+        if writer is None:
+            first = pathlib.Path(entry["segments"][0])
+            segment = first.with_name(f"{first.stem}_part{len(entry['segments']) + 1}{cls.suffix}")
+            header = dict(entry["header"])
+            header["timestamp"] = datetime.datetime.fromtimestamp(now).isoformat()
+            header["continues"] = str(path)
+            writer = cls(segment, header, columns, **kwargs)
+            entry["path"] = str(segment)
+            entry["columns"] = list(columns)
+            entry["segments"].append(str(segment))
+        entry["resumes"].append([stopped, now])
+        self._save()
+        return writer
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".journal-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.entry, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def read_text_record(path):
+    """Read a tab-separated record file.
+
+    Returns
+    -------
+    header : dict
+        Header items. Values are parsed as python literals where possible.
+    columns : list of str
+        Column names.
+    data : numpy.ndarray
+        Array of shape (rows, columns).
+    """
+    from .io import load
+
+    record = load(path)
+    return record.header, record.columns, record.data
+
+
+def convert_text_to_hdf5(path, output=None):
+    """Convert a tab-separated record file to HDF5.
+
+    Parameters
+    ----------
+    path : path-like
+        Text record.
+    output : path-like, optional
+        Destination. Defaults to ``path`` with an ``.h5`` suffix.
+
+    Returns
+    -------
+    pathlib.Path
+        Destination.
+    """
+    path = pathlib.Path(path)
+    if output is None:
+        output = path.with_suffix(HDF5RecordWriter.suffix)
+    header, columns, data = read_text_record(path)
+    with HDF5RecordWriter(output, header, columns) as writer:
+        writer.write_rows(data)
+    return pathlib.Path(output)
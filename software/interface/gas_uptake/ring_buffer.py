@@ -0,0 +1,69 @@
+"""Fixed capacity history of rows with constant time append."""
+
+
+__all__ = ["RingBuffer"]
+
+
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed capacity history of rows, oldest rows are overwritten first.
+
+    Storage is laid out column-wise, one line per channel, so ``view()[i]`` is the
+    history of channel ``i``. Every row is written twice, at ``k`` and
+    ``k + capacity``, which makes the most recent ``capacity`` rows always
+    contiguous in memory. Append is O(1) regardless of capacity, and ``view``
+    returns a numpy view, never a copy.
+
+    Parameters
+    ----------
+    capacity : int
+        Maximum number of rows kept.
+    width : int
+        Number of channels per row.
+    dtype : numpy dtype
+        Data type of the storage.
+    """
+
+    def __init__(self, capacity, width, dtype=np.float64):
+        self.capacity = int(capacity)
+        self.width = int(width)
+        self._data = np.full((self.width, 2 * self.capacity), np.nan, dtype=dtype)
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.view(), dtype=dtype)
+
+    def append(self, row):
+        """Add one row, discarding the oldest if full."""
+        i = self.count % self.capacity
+        self._data[:, i] = row
+        self._data[:, i + self.capacity] = row
+        self.count += 1
+
+    def clear(self):
+        self._data[:] = np.nan
+        self.count = 0
+
+    def view(self, n=None):
+        """Most recent ``n`` rows (default all), oldest first, shape (width, n).
+
+        The returned array is a view into the buffer and is only valid until the
+        next ``capacity - n`` appends.
+        """
+        size = len(self)
+        if n is None or n > size:
+            n = size
+        stop = self.count % self.capacity + self.capacity
+        return self._data[:, stop - n : stop]
+
+    @property
+    def last(self):
+        """Most recent row, or None if empty."""
+        if not self.count:
+            return None
+        return self._data[:, (self.count - 1) % self.capacity]
@@ -0,0 +1,71 @@
+"""Receive rows pushed by the gas uptake director's stream server."""
+
+
+__all__ = ["Subscription"]
+
+
+import json
+import socket
+import struct
+
+import numpy as np
+
+
+magic = b"GUS1"
+
+
+class Subscription:
+    """Live rows from a director, as they are acquired.
+
+    Iterating yields one numpy array per row, in ``columns`` order, blocking until
+    the next row arrives. Iteration ends when the director closes the stream.
+
+    Parameters
+    ----------
+    host : str
+        Director host.
+    port : int
+        Director ``stream_port``.
+    timeout : float, optional
+        Socket timeout, seconds. None blocks forever.
+
+    Examples
+    --------
+    >>> with Subscription("raspberrypi.local", 39010) as sub:
+    ...     for row in sub:
+    ...         print(dict(zip(sub.columns, row)))
+    """
+
+    def __init__(self, host, port, timeout=None):
+        self._socket = socket.create_connection((host, port), timeout=timeout)
+        self._file = self._socket.makefile("rb")
+        if self._read(len(magic)) != magic:
+            self.close()
+            raise ConnectionError(f"{host}:{port} is not a gas uptake stream")
+        (size,) = struct.unpack("<I", self._read(4))
+        header = json.loads(self._read(size))
+        self.columns = header["columns"]
+        self._frame_size = 8 * len(self.columns)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            frame = self._file.read(self._frame_size)
+            if len(frame) < self._frame_size:
+                return
+            yield np.frombuffer(frame, dtype="<f8")
+
+    def _read(self, n):
+        data = self._file.read(n)
+        if len(data) < n:
+            raise ConnectionError("stream closed during header")
+        return data
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
@@ -24,6 +24,7 @@ setup(
     package_data={"": extra_files},
     data_files=data_files,
     install_requires=["qtypes"],
+    extras_require={"hdf5": ["h5py"]},
     version=version,
     description="gas_uptake",
     author="Blaise Thompson",
@@ -0,0 +1,81 @@
+import logging
+import warnings
+
+import numpy as np
+import pytest
+
+from gas_uptake.calibration import Calibration
+from gas_uptake._poll_worker import create_calibration
+
+
+@pytest.fixture
+def calibration():
+    return Calibration([("a", "channel_0"), ("a", "channel_1"), ("b", "channel_0")])
+
+
+def test_gather(calibration):
+    measured = {"a": {"channel_0": 1.0, "channel_1": 2.0}, "b": {"channel_0": 3.0}}
+    np.testing.assert_array_equal(calibration.gather(measured), [1.0, 2.0, 3.0])
+
+
+def test_gather_failed_device_is_nan(calibration):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        out = calibration.gather({"a": None})
+    assert np.isnan(out).all()
+
+
+def test_missing_channel_reported_once(calibration):
+    measured = {"a": {"measurement_id": 3, "channel_0": 1.0}, "b": {"channel_0": 3.0}}
+    with pytest.warns(RuntimeWarning, match="a reading has no channel_1"):
+        out = calibration.gather(measured)
+    np.testing.assert_array_equal(out, [1.0, np.nan, 3.0])
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        calibration.gather(measured)
+        calibration.gather({"a": {"channel_0": 1.0, "channel_1": 2.0}})
+    # reported again when lost again
+    with pytest.warns(RuntimeWarning):
+        calibration.gather(measured)
+
+
+def test_nothing_measured_yet_not_reported(calibration):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        out = calibration.gather({"a": {"measurement_id": 0}, "b": {"measurement_id": 0}})
+    assert np.isnan(out).all()
+
+
+def test_missing_channel_logged(caplog):
+    logger = logging.getLogger("test-calibration")
+    calibration = Calibration([("a", "channel_0"), ("a", "channel_1")], logger=logger)
+    with caplog.at_level(logging.WARNING):
+        calibration.gather({"a": {"measurement_id": 0}})
+        assert not caplog.text
+        calibration.gather({"a": {"measurement_id": 1, "channel_0": 1.0}})
+    assert "a reading has no channel_1" in caplog.text
+
+
+def test_convert_round_trip(calibration):
+    calibration.offsets[:] = [0.1, 0.0, -0.1]
+    psi = np.array([10.0, 50.0, 100.0])
+    raw = calibration.invert(psi) + calibration.offsets
+    np.testing.assert_allclose(calibration.convert(raw), psi)
+
+
+def test_calibration_from_boards():
+    boards = [{"name": "a", "channels": ["channel_0", "channel_1"]}, {"name": "b", "channels": []}]
+    with pytest.raises(ValueError, match="'b'"):
+        create_calibration({"boards": boards})
+    boards[1]["channels"] = ["channel_3"]
+    calibration = create_calibration({"boards": boards})
+    out = calibration.gather({"a": {"channel_0": 1.0, "channel_1": 2.0}, "b": {"channel_3": 3.0}})
+    np.testing.assert_array_equal(out, [1.0, 2.0, 3.0])
+
+
+def test_calibration_channels_override_boards():
+    config = {
+        "boards": [{"name": "a"}],
+        "calibration": {"channels": [{"device": "a", "key": "channel_2"}]},
+    }
+    assert len(create_calibration(config)) == 1
@@ -0,0 +1,42 @@
+import datetime
+
+import numpy as np
+
+from gas_uptake.catalog import Catalog
+from gas_uptake.recording import TextRecordWriter
+
+
+def write_record(path, columns, rows):
+    header = {"timestamp": "2026-01-02T03:04:05", "temperature setpoint": 80.0}
+    with TextRecordWriter(path, header, columns) as writer:
+        writer.write_rows(rows)
+
+
+def test_channels_exclude_rates(tmp_path):
+    columns = ["labtime", "temperature", "pressure_0", "pressure_1", "pressure_0_rate"]
+    columns.append("pressure_1_rate")
+    rows = [[1000.0 + i, 80.0, 50.0 - i, 40.0, -1.0, 0.0] for i in range(5)]
+    write_record(tmp_path / "gas-uptake_a.txt", columns, rows)
+    with Catalog(tmp_path) as catalog:
+        assert catalog.update(tmp_path) == 1
+        channels = catalog.channels(tmp_path / "gas-uptake_a.txt")
+    assert [c["column"] for c in channels] == ["pressure_0", "pressure_1"]
+    assert channels[0]["uptake"] == 4.0
+    assert channels[1]["uptake"] == 0.0
+
+
+def test_update_and_search(tmp_path):
+    columns = ["labtime", "temperature", "pressure_0"]
+    write_record(tmp_path / "gas-uptake_a.txt", columns, [[1000.0, 80.0, 50.0]])
+    write_record(tmp_path / "gas-uptake_b.txt", columns, [[2000.0, 120.0, 50.0]])
+    with Catalog(tmp_path) as catalog:
+        assert catalog.update(tmp_path) == 2
+        assert catalog.update(tmp_path) == 0  # unchanged files are not read again
+        hot = catalog.search(min_temperature=100)
+        assert [run["path"] for run in hot] == [str(tmp_path / "gas-uptake_b.txt")]
+        since = datetime.datetime.fromtimestamp(1500)
+        assert len(catalog.search(since=since)) == 1
+        (tmp_path / "gas-uptake_a.txt").unlink()
+        catalog.update(tmp_path)
+        assert len(catalog.search()) == 1
+        assert np.isclose(catalog.search()[0]["setpoint"], 80.0)
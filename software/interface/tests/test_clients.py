@@ -0,0 +1,147 @@
+import logging
+
+import pytest
+
+from gas_uptake import clients
+from gas_uptake.clients import ManagedClient, Unavailable, start_measuring
+
+
+class Daemon:
+    """What the stub clients talk to, standing in for a yaq daemon."""
+
+    def __init__(self):
+        self.up = True
+        self.connections = 0
+        self.measuring = False
+        self.handshake = None
+
+    def restart(self):
+        # the daemon comes back without its measure loop, yaqc reconnects silently
+        self.measuring = False
+        self.handshake()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def daemon(monkeypatch):
+    daemon = Daemon()
+
+    class Client:
+        _protocol = {"messages": {"get_measured": {}, "measure": {}}}
+
+        def __init__(self, port, host, timeout):
+            if not daemon.up:
+                raise ConnectionRefusedError(port)
+            daemon.connections += 1
+
+        def register_connection_callback(self, callback):
+            daemon.handshake = callback
+
+        def measure(self, loop):
+            daemon.measuring = loop
+
+        def get_measured(self):
+            if not daemon.up:
+                raise ConnectionResetError()
+            return {"measurement_id": 1, "measuring": daemon.measuring}
+
+        def set_position(self, position):
+            raise ValueError("out of limits")  # returned by the daemon
+
+    monkeypatch.setattr("yaqc.Client", Client)
+    return daemon
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(clients, "time", clock)
+    return clock
+
+
+def test_connects_on_first_use(daemon, clock):
+    client = ManagedClient("127.0.0.1", 39000, on_connect=start_measuring)
+    assert not client.connected and daemon.connections == 0
+    assert client.get_measured()["measuring"]
+    assert client.connected and daemon.connections == 1
+    assert client.has_message("measure") and not client.has_message("set_position")
+    assert client.health()["seconds_since_success"] == 0.0
+
+
+def test_backoff_doubles_up_to_max(daemon, clock):
+    daemon.up = False
+    client = ManagedClient("127.0.0.1", 39000, backoff=1.0, max_backoff=3.0)
+    delays = []
+    for _ in range(4):
+        with pytest.raises(ConnectionRefusedError):
+            client.get_measured()
+        # waiting calls fail at once, without trying to connect
+        with pytest.raises(Unavailable):
+            client.get_measured()
+        delays.append(client._next_attempt - clock.now)
+        clock.now = client._next_attempt
+    assert delays == [1.0, 2.0, 3.0, 3.0]
+    health = client.health()
+    assert (health["consecutive_failures"], health["failures"]) == (4, 4)
+    assert not health["connected"]
+    assert "ConnectionRefusedError" in health["last_error"]
+
+
+def test_reconnect_after_failure(daemon, clock, caplog):
+    client = ManagedClient(
+        "127.0.0.1", 39000, on_connect=start_measuring, logger=logging.getLogger()
+    )
+    client.get_measured()
+    daemon.up = False
+    with caplog.at_level(logging.INFO):
+        with pytest.raises(ConnectionResetError):
+            client.get_measured()
+        assert not client.connected
+        daemon.up = True
+        daemon.measuring = False
+        clock.now += client.backoff
+        assert client.get_measured()["measuring"]  # on_connect ran again
+    assert "failed" in caplog.text and "reconnected" in caplog.text
+    health = client.health()
+    assert (health["consecutive_failures"], health["failures"]) == (0, 1)
+    assert health["reconnects"] == 1
+    assert daemon.connections == 2
+
+
+def test_on_connect_after_silent_reconnect(daemon, clock):
+    client = ManagedClient("127.0.0.1", 39000, on_connect=start_measuring)
+    client.get_measured()
+    daemon.restart()
+    client.get_measured()
+    assert daemon.measuring
+    assert client.reconnects == 1
+    assert daemon.connections == 1  # same yaqc client
+
+
+def test_failing_on_connect_counts_as_failure(daemon, clock):
+    def on_connect(client):
+        raise ConnectionResetError()
+
+    client = ManagedClient("127.0.0.1", 39000, on_connect=on_connect)
+    with pytest.raises(ConnectionResetError):
+        client.get_measured()
+    assert not client.connected
+    with pytest.raises(Unavailable):
+        client.get_measured()
+
+
+def test_daemon_error_keeps_connection(daemon, clock):
+    client = ManagedClient("127.0.0.1", 39000)
+    with pytest.raises(ValueError):
+        client.set_position(1000.0)
+    assert client.connected
+    assert client.health()["failures"] == 0
+    client.get_measured()
+    assert daemon.connections == 1
@@ -0,0 +1,67 @@
+import pathlib
+
+import numpy as np
+import pytest
+
+from gas_uptake.io import Record, load
+from gas_uptake.recording import TextRecordWriter
+
+
+def record(columns, rows=3):
+    data = np.arange(rows * len(columns), dtype=float).reshape(rows, len(columns))
+    return Record(pathlib.Path("gas-uptake_test.txt"), {}, columns, data)
+
+
+def test_pressure_excludes_noise_and_rates():
+    columns = ["labtime", "temperature"]
+    columns += [f"pressure_{i}" for i in range(2)]
+    columns += [f"pressure_{i}_std" for i in range(2)]
+    columns += [f"pressure_{i}_rate" for i in range(2)]
+    r = record(columns)
+    assert r.pressure_columns == ["pressure_0", "pressure_1"]
+    np.testing.assert_array_equal(r.pressure, r.data[:, 2:4])
+
+
+def test_temperature_zones():
+    r = record(["labtime", "temperature_left", "temperature_right", "pressure_0"])
+    assert r.temperature.shape == (3, 2)
+    np.testing.assert_array_equal(r.temperature, r.data[:, 1:3])
+
+
+def test_single_temperature():
+    r = record(["labtime", "temperature", "pressure_0"])
+    np.testing.assert_array_equal(r.temperature, r.data[:, 1])
+
+
+def test_time_relative_to_first_row():
+    r = record(["labtime", "temperature", "pressure_0"])
+    np.testing.assert_array_equal(r.time, [0.0, 3.0, 6.0])
+
+
+def write_text_record(path, tail=b""):
+    header = {"timestamp": "2026-01-02T03:04:05"}
+    with TextRecordWriter(path, header, ["labtime", "temperature", "pressure_0"]) as writer:
+        writer.write_rows([[1000.0 + i, 80.0, 50.0 - i] for i in range(3)])
+    with open(path, "ab") as f:
+        f.write(tail)
+
+
+@pytest.mark.parametrize(
+    "tail", [b"", b"1003.000000\t     na", b"1003.000000\t-", b"1003.0\t80.0\t" + b"\0" * 64]
+)
+def test_load_text_with_partial_row(tmp_path, tail):
+    path = tmp_path / "gas-uptake_a.txt"
+    write_text_record(path, tail)
+    r = load(path)
+    assert r.header["timestamp"] == "2026-01-02T03:04:05"
+    assert r.columns == ["labtime", "temperature", "pressure_0"]
+    np.testing.assert_array_equal(r.pressure[:, 0], [50.0, 49.0, 48.0])
+
+
+def test_load_text_cache(tmp_path):
+    path = tmp_path / "gas-uptake_a.txt"
+    write_text_record(path)
+    first = load(path, cache=True)
+    cached = load(path, cache=True)
+    assert (tmp_path / "gas-uptake_a.txt.npy").exists()
+    np.testing.assert_array_equal(first.data, cached.data)
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from gas_uptake.online import EWMA, PlateauDetector, SlidingRate, UptakeMonitor
+
+
+def polyfit_slope(t, y):
+    return np.polyfit(t, y, 1)[0]
+
+
+def test_sliding_rate_matches_least_squares():
+    rng = np.random.default_rng(0)
+    t = 1.7e9 + np.cumsum(rng.uniform(0.5, 1.5, 500))  # epoch seconds, uneven
+    y = np.column_stack([100 - 0.01 * (t - t[0]), 50 + np.sin((t - t[0]) / 20)])
+    y += rng.normal(0, 0.01, y.shape)
+    rate = SlidingRate(2, window=30)
+    for i in range(len(t)):
+        rate.append(t[i], y[i])
+        if i >= 1:
+            start = max(0, i - 29)
+            expected = [polyfit_slope(t[start : i + 1], y[start : i + 1, c]) for c in range(2)]
+            np.testing.assert_allclose(rate.value, expected, rtol=1e-6, atol=1e-9)
+
+
+def test_sliding_rate_no_drift_over_long_run():
+    rate = SlidingRate(1, window=10)
+    t0 = 1.7e9
+    for i in range(20_000):
+        rate.append(t0 + i, [5.0 - 1e-3 * i])
+    assert rate.value[0] == pytest.approx(-1e-3, rel=1e-9)
+
+
+def test_sliding_rate_skips_nan_per_channel():
+    rate = SlidingRate(2, window=5)
+    for i in range(5):
+        rate.append(float(i), [2.0 * i, np.nan if i % 2 else 3.0 * i])
+    np.testing.assert_allclose(rate.value, [2.0, 3.0])
+
+
+def test_sliding_rate_needs_two_points():
+    rate = SlidingRate(2, window=5)
+    assert np.isnan(rate.value).all()
+    rate.append(0.0, [1.0, np.nan])
+    rate.append(1.0, [2.0, np.nan])
+    assert rate.value[0] == pytest.approx(1.0)
+    assert np.isnan(rate.value[1])
+    rate.clear()
+    assert np.isnan(rate.value).all()
+    with pytest.raises(ValueError):
+        SlidingRate(1, window=1)
+
+
+def test_ewma():
+    ewma = EWMA(2, alpha=0.5)
+    ewma.append([2.0, np.nan])
+    ewma.append([4.0, 1.0])
+    ewma.append([np.nan, 3.0])
+    np.testing.assert_allclose(ewma.value, [3.0, 2.0])
+
+
+def test_plateau_detector():
+    plateau = PlateauDetector(2, threshold=0.1, hold=10)
+    for t in range(12):
+        plateau.append(float(t), [0.0, 1.0 if t == 5 else 0.0])
+    np.testing.assert_array_equal(plateau.duration, [11.0, 5.0])
+    np.testing.assert_array_equal(plateau.finished, [True, False])
+    plateau.append(12.0, [np.nan, 0.0])
+    np.testing.assert_array_equal(plateau.finished, [False, False])
+
+
+def test_uptake_monitor_finishes_when_pressure_levels_off():
+    monitor = UptakeMonitor(1, window=10, alpha=0.5, plateau_rate=1e-3, plateau_time=30)
+    for t in range(200):
+        monitor.append(float(t), [max(100.0 - 0.5 * t, 60.0)])
+        if t == 50:
+            assert monitor.rate[0] == pytest.approx(-0.5)
+            assert not monitor.finished[0]
+    assert monitor.finished[0]
+    assert monitor.plateau_time[0] >= 30
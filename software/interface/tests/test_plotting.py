@@ -0,0 +1,79 @@
+import math
+
+import numpy as np
+import pytest
+
+from gas_uptake._plotting import MinMaxDecimator, RunningMax
+from gas_uptake.ring_buffer import RingBuffer
+
+
+def feed(buffer, rng, n):
+    for _ in range(n):
+        t = buffer.count
+        buffer.append([t, math.sin(t / 50) + rng.normal(0, 0.1), rng.normal()])
+
+
+def test_incremental_matches_fresh_decimation():
+    rng = np.random.default_rng(1)
+    buffer = RingBuffer(1000, 3)
+    cached = MinMaxDecimator(buffer)
+    for step in [5, 100, 1, 333, 1000, 2500, 7]:
+        feed(buffer, rng, step)
+        xs, ys = cached.update(100)
+        fresh_xs, fresh_ys = MinMaxDecimator(buffer).update(100)
+        np.testing.assert_array_equal(xs, fresh_xs)
+        np.testing.assert_array_equal(ys, fresh_ys)
+
+
+def test_points_bounded_and_extremes_kept():
+    rng = np.random.default_rng(2)
+    buffer = RingBuffer(5000, 3)
+    feed(buffer, rng, 4321)
+    data = buffer.view()
+    data[1, 1234] = 50.0  # spike
+    xs, ys = MinMaxDecimator(buffer).update(200)
+    assert ys.shape[1] <= 2 * 200 + 4
+    for channel in range(2):
+        assert ys[channel].max() == data[channel + 1].max()
+        assert ys[channel].min() == data[channel + 1].min()
+        assert np.all(np.diff(xs[channel]) >= 0)  # in the order they occurred
+
+
+def test_small_buffer_not_decimated():
+    buffer = RingBuffer(100, 2)
+    for t in range(10):
+        buffer.append([t, 2.0 * t])
+    xs, ys = MinMaxDecimator(buffer).update(1000)
+    # bins of one row, each row is its own minimum and maximum
+    np.testing.assert_array_equal(xs[0], np.repeat(np.arange(10), 2))
+    np.testing.assert_array_equal(ys[0], np.repeat(2.0 * np.arange(10), 2))
+
+
+def test_nan_ignored_within_bins():
+    buffer = RingBuffer(64, 2)
+    for t in range(64):
+        buffer.append([t, np.nan if t % 3 else float(t)])
+    _, ys = MinMaxDecimator(buffer).update(4)
+    assert np.nanmax(ys) == 63.0
+
+
+@pytest.mark.parametrize("window", [1, 3, 17])
+def test_running_max_matches_brute_force(window):
+    rng = np.random.default_rng(window)
+    values = rng.normal(size=300)
+    values[rng.integers(0, 300, 40)] = np.nan
+    running = RunningMax(window)
+    for i, value in enumerate(values):
+        running.append(value)
+        recent = values[max(0, i + 1 - window) : i + 1]
+        if np.isnan(recent).all():
+            assert math.isnan(running.value)
+        else:
+            assert running.value == np.nanmax(recent)
+
+
+def test_running_max_clear():
+    running = RunningMax(5)
+    running.append(3.0)
+    running.clear()
+    assert math.isnan(running.value)
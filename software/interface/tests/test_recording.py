@@ -0,0 +1,187 @@
+import math
+import os
+
+import numpy as np
+import pytest
+
+from gas_uptake.io import load
+from gas_uptake.recording import DeadbandFilter, RunJournal, open_record_writer
+
+
+inf = math.inf
+
+
+def run(f, rows):
+    return [list(row) for r in rows for row in f.filter(r)]
+
+
+def test_constant_rows_written_every_max_interval():
+    f = DeadbandFilter([inf, 0.5], max_interval=10)
+    rows = [[t, 1.0] for t in range(25)]
+    assert run(f, rows) == [[0, 1.0], [10, 1.0], [20, 1.0]]
+    assert (f.seen, f.written) == (25, 3)
+    assert f.ratio == pytest.approx(25 / 3)
+
+
+def test_change_writes_held_row_first():
+    f = DeadbandFilter([inf, 0.5], max_interval=100)
+    rows = [[0, 1.0], [1, 1.1], [2, 1.2], [3, 2.0], [4, 2.0]]
+    # the row before the jump shows when the change began
+    assert run(f, rows) == [[0, 1.0], [2, 1.2], [3, 2.0]]
+
+
+def test_change_right_after_kept_row_has_nothing_held():
+    f = DeadbandFilter([inf, 0.5], max_interval=100)
+    assert run(f, [[0, 1.0], [1, 3.0], [2, 5.0]]) == [[0, 1.0], [1, 3.0], [2, 5.0]]
+
+
+def test_held_row_not_written_on_max_interval():
+    f = DeadbandFilter([inf, 0.5], max_interval=2)
+    assert run(f, [[0, 1.0], [1, 1.0], [2, 1.0]]) == [[0, 1.0], [2, 1.0]]
+
+
+def test_slow_drift_accumulates_against_last_kept_row():
+    f = DeadbandFilter([inf, 0.5], max_interval=100)
+    rows = [[t, 0.2 * t] for t in range(7)]
+    # 0.6 is past the deadband from 0.0, then 1.2 from 0.6
+    assert [row[0] for row in run(f, rows)] == [0, 2, 3, 5, 6]
+
+
+def test_nan_appearing_or_clearing_is_a_change():
+    f = DeadbandFilter([inf, 0.5], max_interval=100)
+    rows = [[0, 1.0], [1, math.nan], [2, math.nan], [3, 1.0]]
+    out = run(f, rows)
+    assert [row[0] for row in out] == [0, 1, 2, 3]
+
+
+def test_infinite_deadband_never_triggers():
+    f = DeadbandFilter([inf, inf, 0.5], max_interval=100)
+    rows = [[0, 1.0, 5.0], [1, 50.0, 5.0], [2, math.nan, 5.0]]
+    assert run(f, rows) == [[0, 1.0, 5.0]]
+
+
+def test_zero_max_interval_keeps_every_row():
+    f = DeadbandFilter([inf, inf], max_interval=0)
+    rows = [[t, 1.0] for t in range(5)]
+    assert run(f, rows) == rows
+    assert f.ratio == 1
+
+
+def test_reset():
+    f = DeadbandFilter([inf, 0.5], max_interval=100)
+    run(f, [[0, 1.0], [1, 1.0]])
+    f.reset()
+    assert (f.seen, f.written) == (0, 0)
+    assert np.isnan(f.ratio)
+    assert run(f, [[5, 1.0]]) == [[5, 1.0]]
+
+
+# RunJournal
+
+
+columns = ["labtime", "temperature", "pressure_0"]
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return RunJournal(tmp_path / "state" / "run.json")
+
+
+def start(journal, tmp_path, format="txt", rows=3):
+    header = {"timestamp": "2026-01-02T03:04:05", "temperature setpoint": 80.0}
+    writer = open_record_writer(tmp_path / "gas-uptake_a", header, columns, format=format)
+    writer.write_rows([[1000.0 + i, 80.0, 50.0 - i] for i in range(rows)])
+    writer.close()  # as if the program died after the last flush
+    journal.begin(writer.path, header, columns, format=format, setpoint=80.0)
+    return writer.path
+
+
+def test_no_journal_no_resume(journal):
+    assert journal.resume(columns) is None
+    assert journal.entry is None
+
+
+def test_resume_appends_after_gap_row(journal, tmp_path):
+    start(journal, tmp_path)
+    journal.note(setpoint=90.0)
+    resumed = RunJournal(journal.path)
+    writer = resumed.resume(columns)
+    writer.write([2000.0, 90.0, 40.0])
+    writer.close()
+    data = load(writer.path).data
+    assert data.shape == (5, 3)
+    assert np.isnan(data[3, 1:]).all()
+    assert data[4].tolist() == [2000.0, 90.0, 40.0]
+    assert resumed.entry["state"] == {"setpoint": 90.0}
+    assert resumed.entry["segments"] == [str(writer.path)]
+    [(stopped, restarted)] = resumed.entry["resumes"]
+    assert stopped <= restarted
+
+
+def test_resume_cuts_partial_text_row(journal, tmp_path):
+    path = start(journal, tmp_path)
+    with open(path, "a") as f:
+        f.write("1003.000000\t80.00")  # crash in the middle of a write
+    writer = RunJournal(journal.path).resume(columns)
+    writer.write([2000.0, 80.0, 40.0])
+    writer.close()
+    data = load(path).data
+    assert data[:, 0].tolist()[:3] == [1000.0, 1001.0, 1002.0]
+    assert data[-1].tolist() == [2000.0, 80.0, 40.0]
+    assert len(data) == 5
+
+
+def test_resume_evens_hdf5_columns(journal, tmp_path):
+    h5py = pytest.importorskip("h5py")
+    path = start(journal, tmp_path, format="h5")
+    with h5py.File(path, "a") as f:
+        f["labtime"].resize((4,))  # crash between resizing two datasets
+    writer = RunJournal(journal.path).resume(columns)
+    writer.close()
+    data = load(path).data
+    assert data.shape == (4, 3)
+    assert np.isnan(data[3, 1:]).all()
+
+
+def test_changed_columns_start_linked_segment(journal, tmp_path):
+    first = start(journal, tmp_path)
+    resumed = RunJournal(journal.path)
+    writer = resumed.resume(columns + ["pressure_1"])
+    writer.close()
+    assert writer.path == first.with_name("gas-uptake_a_part2.txt")
+    record = load(writer.path)
+    assert record.header["continues"] == str(first)
+    assert record.header["temperature setpoint"] == 80.0
+    assert record.columns == columns + ["pressure_1"]
+    assert resumed.entry["segments"] == [str(first), str(writer.path)]
+    assert len(load(first)) == 3  # untouched
+
+
+def test_missing_record_starts_linked_segment(journal, tmp_path):
+    first = start(journal, tmp_path)
+    first.unlink()
+    writer = RunJournal(journal.path).resume(columns)
+    writer.close()
+    assert writer.path.name == "gas-uptake_a_part2.txt"
+
+
+def test_stale_run_not_resumed(journal, tmp_path):
+    path = start(journal, tmp_path)
+    os.utime(path, (0, 0))
+    assert RunJournal(journal.path).resume(columns, max_gap=60) is None
+    assert not journal.path.exists()
+
+
+def test_damaged_journal_is_discarded(journal):
+    journal.path.parent.mkdir()
+    journal.path.write_text('{"path": ')
+    assert journal.resume(columns) is None
+    assert not journal.path.exists()
+
+
+def test_end(journal, tmp_path):
+    start(journal, tmp_path)
+    journal.end()
+    journal.note(setpoint=1.0)  # ignored between runs
+    assert not journal.path.exists()
+    assert RunJournal(journal.path).resume(columns) is None
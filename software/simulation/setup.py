@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+"""The setup script."""
+
+import pathlib
+from setuptools import setup, find_packages
+
+here = pathlib.Path(__file__).parent
+
+with open(here / "simulation" / "VERSION") as version_file:
+    version = version_file.read().strip()
+
+
+with open("README.md") as readme_file:
+    readme = readme_file.read()
+
+
+requirements = ["yaqd-core", "numpy"]
+
+extra_requirements = {"dev": ["black", "pre-commit"]}
+extra_files = {"simulation": ["VERSION", "*.avpr"]}
+
+setup(
+    author="Blaise Thompson",
+    author_email="blaise.thompson@wisc.edu",
+    python_requires=">=3.7",
+    classifiers=[
+        "Development Status :: 3 - Alpha",
+        "Intended Audience :: Science/Research",
+        "License :: OSI Approved :: GNU Lesser General Public License v3 (LGPLv3)",
+        "Natural Language :: English",
+        "Programming Language :: Python :: 3",
+        "Programming Language :: Python :: 3.7",
+        "Programming Language :: Python :: 3.8",
+        "Programming Language :: Python :: 3.9",
+        "Topic :: Scientific/Engineering",
+    ],
+    description="Simulated yaq daemons for the gas uptake reactor.",
+    entry_points={
+        "console_scripts": [
+            "yaqd-fake-mcp3428=simulation._fake_mcp3428:FakeMCP3428.main",
+            "yaqd-fake-mcp9600=simulation._fake_mcp9600:FakeMCP9600.main",
+            "yaqd-fake-gpio-digital-output=simulation._fake_gpio_digital_output:FakeGPIODigitalOutput.main",
+        ],
+    },
+    install_requires=requirements,
+    extras_require=extra_requirements,
+    license="GNU Lesser General Public License v3 (LGPL)",
+    long_description=readme,
+    long_description_content_type="text/markdown",
+    include_package_data=True,
+    package_data=extra_files,
+    keywords="simulation",
+    name="simulation",
+    packages=find_packages(include=["simulation", "simulation.*"]),
+    url="https://gitlab.com/yaq/director",
+    version=version,
+    zip_safe=False,
+)
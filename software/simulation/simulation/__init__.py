@@ -0,0 +1,5 @@
+from .__version__ import *
+from ._uptake import *
+from ._fake_mcp3428 import *
+from ._fake_mcp9600 import *
+from ._fake_gpio_digital_output import *
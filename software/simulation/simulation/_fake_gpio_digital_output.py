@@ -0,0 +1,46 @@
+__all__ = ["FakeGPIODigitalOutput"]
+
+import time
+
+import numpy as np
+from yaqd_core import IsDaemon
+
+from ._faults import Faults
+
+
+class FakeGPIODigitalOutput(IsDaemon):
+    _kind = "fake-gpio-digital-output"
+
+    def __init__(self, name, config, config_filepath):
+        super().__init__(name, config, config_filepath)
+        self._faults = Faults(self._config, np.random.default_rng(self._config["seed"]))
+        self._value = 0
+        self._on_since = None
+        self._on_time = 0.0
+        self._transitions = 0
+
+    def set_value(self, value):
+        self._faults.inject()
+        value = int(bool(value))
+        if value == self._value:
+            return
+        now = time.monotonic()
+        if value:
+            self._on_since = now
+        else:
+            self._on_time += now - self._on_since
+            self._on_since = None
+        self._value = value
+        self._transitions += 1
+
+    def get_value(self):
+        self._faults.inject()
+        return self._value
+
+    def get_on_time(self):
+        if self._on_since is None:
+            return self._on_time
+        return self._on_time + time.monotonic() - self._on_since
+
+    def get_transitions(self):
+        return self._transitions
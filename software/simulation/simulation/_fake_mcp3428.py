@@ -0,0 +1,49 @@
+__all__ = ["FakeMCP3428"]
+
+import asyncio
+import time
+
+import numpy as np
+from yaqd_core import HasMeasureTrigger
+
+from ._faults import Faults
+from ._uptake import UptakeCurve
+
+
+class FakeMCP3428(HasMeasureTrigger):
+    _kind = "fake-mcp3428"
+
+    def __init__(self, name, config, config_filepath):
+        super().__init__(name, config, config_filepath)
+        rng = np.random.default_rng(self._config["seed"])
+        self._faults = Faults(self._config, rng)
+        self._curve = UptakeCurve(
+            self._config["channels"],
+            initial_pressure=self._config["initial_pressure"],
+            uptake=self._config["uptake"],
+            time_constant=self._config["time_constant"],
+            spread=self._config["time_constant_spread"],
+            delay=self._config["uptake_delay"],
+            noise=self._config["noise"],
+            rng=rng,
+        )
+        self._channel_names = [
+            f"{self._config['channel_prefix']}{i}" for i in range(self._config["channels"])
+        ]
+        units = "A" if self._config["units"] == "A" else "mA"
+        self._channel_units = {k: units for k in self._channel_names}
+        self._scale = 1e-3 if units == "A" else 1.0
+        self._started = time.monotonic()
+
+    async def _measure(self):
+        # the real board converts one channel at a time
+        await asyncio.sleep(self._config["conversion_time"] * len(self._channel_names))
+        current = self._curve.current(time.monotonic() - self._started) * self._scale
+        return {k: float(v) for k, v in zip(self._channel_names, current)}
+
+    def get_measured(self):
+        self._faults.inject()
+        return super().get_measured()
+
+    def get_fault_counts(self):
+        return {"failures": self._faults.failures, "hangs": self._faults.hangs}
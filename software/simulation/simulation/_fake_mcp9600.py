@@ -0,0 +1,31 @@
+__all__ = ["FakeMCP9600"]
+
+import asyncio
+
+import numpy as np
+from yaqd_core import HasMeasureTrigger
+
+from ._faults import Faults
+
+
+class FakeMCP9600(HasMeasureTrigger):
+    _kind = "fake-mcp9600"
+
+    def __init__(self, name, config, config_filepath):
+        super().__init__(name, config, config_filepath)
+        self._rng = np.random.default_rng(self._config["seed"])
+        self._faults = Faults(self._config, self._rng)
+        self._channel_names = ["temperature"]
+        self._channel_units = {"temperature": "deg_C"}
+
+    async def _measure(self):
+        await asyncio.sleep(self._config["conversion_time"])
+        value = self._config["temperature"] + self._rng.normal(0, self._config["noise"])
+        return {"temperature": float(value)}
+
+    def get_measured(self):
+        self._faults.inject()
+        return super().get_measured()
+
+    def get_fault_counts(self):
+        return {"failures": self._faults.failures, "hangs": self._faults.hangs}
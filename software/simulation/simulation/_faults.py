@@ -0,0 +1,43 @@
+__all__ = ["Faults"]
+
+import time
+
+
+class Faults:
+    """Latency and failure injection for a simulated daemon.
+
+    ``inject`` is called at the top of a message handler. yaq daemons handle
+    messages on their event loop, so injected latency blocks the whole daemon the
+    way an overloaded single-board computer would.
+
+    Parameters
+    ----------
+    config : dict
+        Daemon config with ``latency``, ``latency_jitter``, ``failure_rate``,
+        ``hang_rate`` and ``hang_time``.
+    rng : numpy.random.Generator
+        Source of randomness.
+    """
+
+    def __init__(self, config, rng):
+        self.latency = config["latency"]
+        self.latency_jitter = config["latency_jitter"]
+        self.failure_rate = config["failure_rate"]
+        self.hang_rate = config["hang_rate"]
+        self.hang_time = config["hang_time"]
+        self._rng = rng
+        self.failures = 0
+        self.hangs = 0
+
+    def inject(self):
+        delay = self.latency
+        if self.latency_jitter:
+            delay += self._rng.exponential(self.latency_jitter)
+        if self.hang_rate and self._rng.random() < self.hang_rate:
+            self.hangs += 1
+            delay += self.hang_time
+        if delay > 0:
+            time.sleep(delay)
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            self.failures += 1
+            raise RuntimeError("simulated failure")
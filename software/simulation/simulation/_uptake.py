@@ -0,0 +1,48 @@
+__all__ = ["UptakeCurve"]
+
+import numpy as np
+
+
+class UptakeCurve:
+    """Synthetic headspace pressure of reactors consuming gas.
+
+    Each channel starts at ``initial_pressure`` and, after ``delay`` seconds,
+    decays exponentially by ``uptake`` PSI with its own time constant. Time constants
+    are spread log-uniformly by up to a factor of ``spread`` either side of
+    ``time_constant``, so channels do not move in lockstep. Gaussian ``noise`` (PSI)
+    is added to every reading.
+
+    ``current`` returns the 4-20 mA transducer signal (0-150 PSI), the quantity the
+    current sense boards actually measure.
+    """
+
+    def __init__(
+        self,
+        channels,
+        initial_pressure=50.0,
+        uptake=20.0,
+        time_constant=600.0,
+        spread=2.0,
+        delay=10.0,
+        noise=0.02,
+        rng=None,
+    ):
+        self._rng = rng if rng is not None else np.random.default_rng()
+        self.initial_pressure = initial_pressure
+        self.uptake = uptake
+        self.delay = delay
+        self.noise = noise
+        factor = spread ** self._rng.uniform(-1, 1, channels) if spread > 1 else np.ones(channels)
+        self.time_constants = time_constant * factor
+
+    def pressure(self, t):
+        """Pressure of each channel, PSI, ``t`` seconds after the start."""
+        elapsed = max(t - self.delay, 0.0)
+        p = self.initial_pressure - self.uptake * (1 - np.exp(-elapsed / self.time_constants))
+        if self.noise:
+            p = p + self._rng.normal(0, self.noise, p.shape)
+        return p
+
+    def current(self, t):
+        """Transducer current of each channel, mA."""
+        return 4 + self.pressure(t) * 20 / 150